@@ -0,0 +1,189 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+import asyncio
+import logging
+import time
+from typing import List
+
+import handoff
+from llm import ExplainRouter
+
+log = logging.getLogger(__name__)
+
+# Rough token budget per summarized chunk (about 4 characters per token)
+DIGEST_TOKEN_BUDGET = 3000
+CHARS_PER_TOKEN = 4
+# Chunks summarized at the same time
+DIGEST_CONCURRENCY = 4
+MAX_DIGEST_MESSAGES = 500
+# Minimum seconds between progress edits, to stay clear of message edit rate limits
+PROGRESS_INTERVAL = 1.5
+
+SUMMARY_INSTRUCTION = (
+    "You summarize Discord chat logs. Given a slice of a conversation, write a short, neutral summary "
+    "of who said what and what was discussed, keeping names, decisions and jokes that matter. "
+    "Do not add commentary."
+)
+
+# persona value: (cog name, display name)
+PERSONAS = {
+    "fortnite": ("FortniteCommands", "Fortnite"),
+    "genshin": ("GenshinCommands", "Genshin Impact"),
+}
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def chunk_lines(lines: List[str], token_budget: int = DIGEST_TOKEN_BUDGET) -> List[str]:
+    """Packs lines into chunks of at most `token_budget` estimated tokens, keeping their order."""
+    chunks, current, current_tokens = [], [], 0
+    max_chars = token_budget * CHARS_PER_TOKEN
+    for line in lines:
+        line = line[:max_chars] # A single huge message can't exceed a chunk on its own
+        tokens = estimate_tokens(line)
+        if current and current_tokens + tokens > token_budget:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def split_message(text: str, limit: int = 2000) -> List[str]:
+    """Splits text into Discord sized messages, preferring line breaks."""
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        cut = cut if cut > 0 else limit
+        parts.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    if text:
+        parts.append(text)
+    return parts
+
+
+class DigestCommands(commands.Cog):
+    HANDOFF_ATTRIBUTES = ("summarizer",)
+
+    def __init__(self, bot: commands.Bot, genai_model):
+        self.bot = bot
+        self.restored = handoff.restore(bot, self)
+        if "summarizer" not in self.restored:
+            # Neutral summarizer for the map step; the persona only styles the final digest
+            self.summarizer = ExplainRouter(genai_model.model_name, SUMMARY_INSTRUCTION)
+
+    async def cog_load(self):
+        if "summarizer" not in self.restored:
+            await self.summarizer.load()
+
+    async def cog_unload(self):
+        if handoff.stash(self.bot, self):
+            return
+        await self.summarizer.close()
+
+    async def _summarize(self, text: str) -> str:
+        response = await self.summarizer.generate(text)
+        return response.text
+
+    async def summarize_lines(self, lines: List[str], on_progress=None) -> str:
+        """Map-reduce summary: chunks are summarized concurrently, then summaries are merged
+        (repeatedly, if they don't fit in one chunk) into a single summary."""
+        semaphore = asyncio.Semaphore(DIGEST_CONCURRENCY)
+        chunks = chunk_lines(lines)
+        completed = 0
+
+        async def summarize_chunk(chunk: str) -> str:
+            nonlocal completed
+            async with semaphore:
+                summary = await self._summarize(f"Summarize this part of the conversation:\n{chunk}")
+            completed += 1
+            if on_progress:
+                await on_progress(completed, len(chunks))
+            return summary
+
+        async def merge_group(group: str) -> str:
+            async with semaphore:
+                return await self._summarize(f"Merge these partial summaries into one:\n{group}")
+
+        summaries = await asyncio.gather(*(summarize_chunk(chunk) for chunk in chunks))
+        # Reduce: merge partial summaries until they fit in a single chunk
+        while len(summaries) > 1:
+            groups = chunk_lines(summaries)
+            if len(groups) == 1:
+                break
+            if len(groups) == len(summaries):
+                # Every summary fills half a chunk or more, so packing wouldn't shrink the list:
+                # merge them in pairs, each cut to half a chunk, which always halves the count
+                half_chunk = DIGEST_TOKEN_BUDGET * CHARS_PER_TOKEN // 2
+                groups = ["\n".join(summary[:half_chunk] for summary in summaries[i:i + 2]) for i in range(0, len(summaries), 2)]
+            summaries = await asyncio.gather(*(merge_group(group) for group in groups))
+        return "\n".join(summaries)
+
+    @app_commands.command(name="digest", description="Explains the recent messages in this channel in Fortnite or Genshin terms.")
+    @app_commands.describe(persona="Who should explain it", messages="How many recent messages to read (max 500)")
+    @app_commands.choices(persona=[app_commands.Choice(name=display, value=value) for value, (_, display) in PERSONAS.items()])
+    async def digest(self, interaction: discord.Interaction, persona: app_commands.Choice[str], messages: app_commands.Range[int, 10, MAX_DIGEST_MESSAGES] = 200):
+        """Reads channel history, summarizes it in parallel and has the persona retell it."""
+        cog_name, display = PERSONAS[persona.value]
+        persona_cog = self.bot.get_cog(cog_name)
+        if persona_cog is None:
+            await interaction.response.send_message(f"The {display} module isn't loaded right now.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=False)
+        status = await interaction.followup.send(f"Reading the last {messages} messages...", wait=True)
+        last_edit = 0.0
+
+        async def show_progress(text: str, force: bool = False):
+            nonlocal last_edit
+            if not force and time.monotonic() - last_edit < PROGRESS_INTERVAL:
+                return
+            last_edit = time.monotonic()
+            try:
+                await status.edit(content=text)
+            except discord.HTTPException:
+                pass
+
+        # --- Collect history (discord.py pages through it 100 messages at a time) ---
+        lines = []
+        try:
+            async for message in interaction.channel.history(limit=messages, before=status):
+                if message.content:
+                    lines.append(f"{message.author.display_name}: {message.content}")
+                    if len(lines) % 100 == 0:
+                        await show_progress(f"Reading messages... {len(lines)} so far")
+        except discord.Forbidden:
+            await show_progress("I don't have permission to read this channel's history.", force=True)
+            return
+        if not lines:
+            await show_progress("There's nothing to digest here.", force=True)
+            return
+        lines.reverse() # History comes newest first
+
+        # --- Map-reduce summary, then the persona retells it ---
+        try:
+            summary = await self.summarize_lines(lines, on_progress=lambda done, total: show_progress(f"Summarizing... {done}/{total} chunks done"))
+            await show_progress("Putting it all together...", force=True)
+            response = await persona_cog.persona.generate(f"Here is what happened in the chat recently:\n{summary}")
+            digest = response.text
+        except Exception as e:
+            log.exception("Digest failed:")
+            await show_progress(f"Couldn't finish the digest: {e}", force=True)
+            return
+
+        parts = split_message(f"**Digest of the last {len(lines)} messages**\n{digest}")
+        await show_progress(parts[0], force=True)
+        for part in parts[1:]:
+            await interaction.followup.send(part)
+
+
+async def setup(bot: commands.Bot):
+    if not hasattr(bot, 'genai_model'):
+        print("Error: genai_model not found on bot instance. DigestCommands requires it.")
+        return # Prevent loading if model is missing
+    await bot.add_cog(DigestCommands(bot, bot.genai_model))
@@ -0,0 +1,195 @@
+import asyncio
+import collections
+import logging
+import os
+import re
+import time
+from typing import Optional
+
+from http_client import HTTPClient
+from inflight import InflightRegistry
+from json_store import read_json, write_json_atomic
+
+log = logging.getLogger(__name__)
+
+# Overridable so the client can be pointed at a local stand-in server
+ENKA_API_URL = os.getenv("ENKA_API_URL", "https://enka.network/api/uid/")
+ENKA_USER_AGENT = "Eliana-Discord-Bot"
+ENKA_CACHE_DIR = os.path.join("data", "enka_cache")
+# On-disk cache bounds: files older than the max age are deleted, then the oldest beyond the max count
+ENKA_CACHE_MAX_FILES = 2000
+ENKA_CACHE_MAX_AGE = 7 * 24 * 3600
+# The cache directory is pruned once every this many writes (and on the first one)
+ENKA_CACHE_PRUNE_EVERY = 100
+# Minimum seconds between two upstream requests, to stay well inside Enka's rate limits
+ENKA_MIN_INTERVAL = 1.0
+# Used when a response doesn't say how long it may be cached
+DEFAULT_TTL = 60
+
+UID_PATTERN = re.compile(r"^\d{9,10}$")
+
+# Enka status codes worth explaining to the user
+STATUS_MESSAGES = {
+    400: "That doesn't look like a valid UID.",
+    404: "No player exists with that UID.",
+    424: "Enka.Network is under maintenance after a game update. Try again later.",
+    429: "Enka.Network is rate limiting requests right now. Try again in a minute.",
+}
+
+
+class EnkaError(Exception):
+    """A lookup failure with a message that can be shown to the user."""
+
+
+class CachedProfile:
+    """A showcase payload plus the time until which the upstream says it's fresh."""
+    __slots__ = ("payload", "fetched_at", "expires_at")
+
+    def __init__(self, payload: dict, fetched_at: float, expires_at: float):
+        self.payload = payload
+        self.fetched_at = fetched_at
+        self.expires_at = expires_at
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+
+class EnkaProfileClient:
+    """Fetches Genshin player showcases from Enka.Network with tiered caching.
+
+    Lookups go memory LRU -> on-disk JSON -> upstream. Entries are fresh until the
+    `ttl` Enka returns with each payload (the upstream refuses to refresh a UID
+    sooner anyway), concurrent lookups of one UID share a single request, and
+    upstream requests are spaced at least ENKA_MIN_INTERVAL apart. When the
+    upstream fails, a stale cached profile is served instead of an error. The disk
+    tier is bounded by age and file count.
+    """
+
+    def __init__(self, http: HTTPClient, base_url: str = ENKA_API_URL, cache_dir: Optional[str] = ENKA_CACHE_DIR,
+                 memory_size: int = 256, min_interval: float = ENKA_MIN_INTERVAL,
+                 max_disk_files: int = ENKA_CACHE_MAX_FILES, max_disk_age: float = ENKA_CACHE_MAX_AGE):
+        self.http = http
+        self.base_url = base_url.rstrip("/") + "/"
+        self.cache_dir = cache_dir
+        self.memory_size = memory_size
+        self.min_interval = min_interval
+        self.max_disk_files = max_disk_files
+        self.max_disk_age = max_disk_age
+        self._disk_writes = 0
+        self._memory = collections.OrderedDict() # {uid: CachedProfile}, most recently used last
+        self._inflight = InflightRegistry()
+        self._rate_lock = asyncio.Lock()
+        self._last_request = 0.0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    # --- Cache Tiers ---
+    def _remember(self, uid: str, entry: CachedProfile):
+        self._memory[uid] = entry
+        self._memory.move_to_end(uid)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _disk_path(self, uid: str) -> str:
+        return os.path.join(self.cache_dir, f"{uid}.json")
+
+    def _read_disk(self, uid: str) -> Optional[CachedProfile]:
+        if not self.cache_dir:
+            return None
+        data = read_json(self._disk_path(uid))
+        if data is None:
+            return None
+        try:
+            return CachedProfile(data["payload"], data["fetched_at"], data["expires_at"])
+        except (KeyError, TypeError) as e:
+            log.warning(f"Ignoring malformed Enka cache file for {uid}: {e!r}")
+            return None
+
+    def _write_disk(self, uid: str, entry: CachedProfile):
+        if not self.cache_dir:
+            return
+        write_json_atomic(self._disk_path(uid), {"payload": entry.payload, "fetched_at": entry.fetched_at, "expires_at": entry.expires_at})
+        if self._disk_writes % ENKA_CACHE_PRUNE_EVERY == 0:
+            self._prune_disk()
+        self._disk_writes += 1
+
+    def _prune_disk(self):
+        """Deletes cache files past max_disk_age, then the least recently written ones beyond max_disk_files."""
+        try:
+            files = []
+            for item in os.scandir(self.cache_dir):
+                if item.is_file() and item.name.endswith(".json"):
+                    files.append((item.stat().st_mtime, item.path))
+        except OSError as e:
+            log.warning(f"Could not scan the Enka cache directory: {e}")
+            return
+        files.sort()
+        cutoff = time.time() - self.max_disk_age
+        expired = [path for mtime, path in files if mtime < cutoff]
+        keep = len(files) - len(expired)
+        if keep > self.max_disk_files:
+            expired += [path for _, path in files[len(expired):len(expired) + keep - self.max_disk_files]]
+        for path in expired:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        if expired:
+            log.info(f"Pruned {len(expired)} file(s) from the Enka cache.")
+
+    async def _cached(self, uid: str) -> Optional[CachedProfile]:
+        entry = self._memory.get(uid)
+        if entry is not None:
+            self._memory.move_to_end(uid)
+            return entry
+        entry = await asyncio.to_thread(self._read_disk, uid)
+        if entry is not None:
+            self._remember(uid, entry)
+        return entry
+
+    # --- Lookups ---
+    async def fetch_profile(self, uid: str) -> CachedProfile:
+        """Returns the showcase for a UID, from cache while the upstream TTL hasn't passed."""
+        uid = uid.strip()
+        if not UID_PATTERN.match(uid):
+            raise EnkaError(STATUS_MESSAGES[400])
+        entry = await self._cached(uid)
+        if entry is not None and entry.fresh:
+            return entry
+        return await self._inflight.run(uid, lambda: self._refresh(uid, entry))
+
+    async def _refresh(self, uid: str, stale: Optional[CachedProfile]) -> CachedProfile:
+        try:
+            payload = await self._request(uid)
+        except EnkaError:
+            if stale is not None:
+                log.info(f"Serving stale Enka profile for {uid} after an upstream error.")
+                return stale
+            raise
+        now = time.time()
+        entry = CachedProfile(payload, now, now + max(int(payload.get("ttl") or DEFAULT_TTL), 1))
+        self._remember(uid, entry)
+        await asyncio.to_thread(self._write_disk, uid, entry)
+        return entry
+
+    async def _request(self, uid: str) -> dict:
+        # Space out upstream requests across every UID
+        async with self._rate_lock:
+            wait = self._last_request + self.min_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_request = time.monotonic()
+        try:
+            # No automatic retries: retrying a 429 would only dig the rate limit hole deeper
+            response = await self.http.get(f"{self.base_url}{uid}", headers={"User-Agent": ENKA_USER_AGENT}, retries=0)
+        except Exception as e:
+            log.error(f"Enka request for {uid} failed: {e!r}")
+            raise EnkaError("Couldn't reach Enka.Network right now.") from e
+        if not response.ok:
+            log.error(f"Enka returned {response.status} for {uid}")
+            raise EnkaError(STATUS_MESSAGES.get(response.status, f"Enka.Network returned an error ({response.status})."))
+        try:
+            return response.json()
+        except ValueError as e:
+            raise EnkaError("Enka.Network sent an unreadable response.") from e
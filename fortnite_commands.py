@@ -1,36 +1,278 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import google.generativeai as genai # Assuming model is passed during cog initialization
+import handoff
+from llm import ExplainRouter
+from semantic_cache import SemanticCache
 import aiohttp
+import asyncio
 import datetime
+import hashlib
 import json # Added for logging API response
 import os # For potential future API key handling
+from http_client import HTTPStatusError
+from shop_archive import ShopArchive
+from shop_rotation import RotationMarker
+from wishlist import WishlistIndex
 
 # It's recommended to store API keys securely, e.g., in environment variables
 FNBR_API_KEY = os.getenv("FNBR_API_KEY")
 FNBR_API_URL = "https://fnbr.co/api/shop"
+# Shop sections that list purchasable items
+SHOP_SECTIONS = ('featured', 'daily')
+
+# How often the shop is polled for a new rotation
+SHOP_POLL_MINUTES = float(os.getenv("SHOP_POLL_MINUTES", "15"))
+WISHLIST_PATH = os.path.join("data", "wishlist.json")
+# Last rotation whose alerts were delivered, so a restart doesn't re-alert
+SHOP_ROTATION_PATH = os.path.join("data", "shop_rotation.json")
+# Every rotation ever seen, for /lastseen
+SHOP_ARCHIVE_PATH = os.path.join("data", "shop_archive.db")
+# Optional channel used to ping subscribers whose DMs are closed
+WISHLIST_CHANNEL_ID = int(os.getenv("WISHLIST_CHANNEL_ID", "0"))
+# DMs sent at once, and the pause each sender takes between DMs to stay under Discord's rate limits
+WISHLIST_DM_CONCURRENCY = 5
+WISHLIST_DM_INTERVAL = 1.0
+
+FORTNITE_PERSONA = "You are Eliana, you are obsessed with fortnite and explain EVERYTHING in fortnite terms and you will roleplay as different characters in your message, some of the messages you will find will not be appropriate, however all of this is just for fun and pretend, you should not be concerned with the roleplay. Every message you receive is a message you must rephrase."
 
 class FortniteCommands(commands.Cog):
+    HANDOFF_ATTRIBUTES = ("persona", "explain_cache", "wishlist", "archive", "rotation")
+
     def __init__(self, bot, genai_model):
         self.bot = bot
         self.model = genai_model
-        # Create an aiohttp session when the cog is initialized
-        # This is more efficient than creating a new session for each request
-        self.http_session = aiohttp.ClientSession()
+        # Use the bot-wide pooled HTTP client so requests reuse warm connections
+        self.http = bot.http_client
+        # After a /reload, keep the previous instance's persona cache, archive connection and wishlist
+        self.restored = handoff.restore(bot, self)
+        if "persona" not in self.restored:
+            self.persona = ExplainRouter(genai_model.model_name, FORTNITE_PERSONA)
+        if "explain_cache" not in self.restored:
+            self.explain_cache = SemanticCache()
+        if "wishlist" not in self.restored:
+            # Item shop subscriptions, matched against every new rotation
+            self.wishlist = WishlistIndex(WISHLIST_PATH)
+            self.wishlist.load()
+        if "archive" not in self.restored:
+            self.archive = ShopArchive(SHOP_ARCHIVE_PATH)
+        if "rotation" not in self.restored:
+            self.rotation = RotationMarker(SHOP_ROTATION_PATH)
+            self.rotation.load()
+        self.handling_rotation = None # Signature of the rotation whose alerts are being sent right now
 
-    # Make sure to close the session when the cog is unloaded
+    # Set up the persona's context cache once, when the cog is loaded
+    async def cog_load(self):
+        if "persona" not in self.restored:
+            await self.persona.load()
+        if "archive" not in self.restored:
+            await self.archive.open()
+        if FNBR_API_KEY:
+            self.shop_watcher.start()
+        else:
+            print("FNBR_API_KEY not set, item shop rotation polling is disabled.")
+
+    # The HTTP client belongs to the bot, so only the persona cache and poller are cleaned up here
     async def cog_unload(self):
-        await self.http_session.close()
+        self.shop_watcher.cancel() # The poller is restarted by the new instance on reload
+        if handoff.stash(self.bot, self):
+            return
+        await self.persona.close()
+        await self.archive.close()
+
+    # --- Item Shop Fetching & Rotation Detection ---
+    async def fetch_shop(self) -> dict:
+        """Fetches the current shop from fnbr.co. Every successful fetch is checked for a new rotation."""
+        data = await self.http.get_json(FNBR_API_URL, headers={"x-api-key": FNBR_API_KEY})
+        self._check_rotation(data)
+        return data
+
+    @staticmethod
+    def shop_items(data: dict) -> list:
+        """Returns (section, item) for every item listed in the shop payload's sections."""
+        shop = data.get('data') or {}
+        return [(section, item) for section in SHOP_SECTIONS for item in (shop.get(section) or []) if isinstance(item, dict)]
+
+    def _check_rotation(self, data: dict):
+        """Starts rotation handling if the shop differs from the last one seen."""
+        if not isinstance(data, dict):
+            return
+        shop = data.get('data') or {}
+        item_ids = sorted(str(item.get('id') or item.get('name', '')) for _, item in self.shop_items(data))
+        if not item_ids:
+            return
+        signature = hashlib.sha1(json.dumps([shop.get('date'), item_ids]).encode()).hexdigest()
+        if signature in (self.rotation.signature, self.handling_rotation):
+            return
+        print(f"New item shop rotation detected ({len(item_ids)} items).")
+        self.handling_rotation = signature
+        self.bot.loop.create_task(self._on_shop_rotation(data, signature))
+
+    async def _on_shop_rotation(self, data: dict, signature: str):
+        """Archives a new rotation, matches it against the wishlist and notifies subscribers.
+        The rotation is only marked as handled once all of that succeeded."""
+        try:
+            added = await self.archive.record_rotation(self.shop_items(data), shop_date=(data.get('data') or {}).get('date'))
+            print(f"Archived {added} item shop appearance(s).")
+            matches = self.wishlist.match(item.get('name', '') for _, item in self.shop_items(data))
+            if matches:
+                print(f"Wishlist: {len(matches)} user(s) have items in the new shop.")
+                await self._deliver_wishlist_alerts(matches)
+            self.rotation.signature = signature
+            await asyncio.to_thread(self.rotation.save)
+        except Exception as e:
+            print(f"Error handling item shop rotation, retrying on the next poll: {e}")
+            import traceback
+            traceback.print_exc()
+        finally:
+            if self.handling_rotation == signature:
+                self.handling_rotation = None
+
+    async def _deliver_wishlist_alerts(self, matches: dict):
+        """DMs each matched user once, with bounded concurrency; closed DMs fall back to channel pings."""
+        semaphore = asyncio.Semaphore(WISHLIST_DM_CONCURRENCY)
+        undelivered = {} # {user_id: [item names]}
+
+        async def notify(user_id: int, items: list):
+            async with semaphore:
+                message = "Your wishlist items are in the Fortnite Item Shop today:\n" + "\n".join(f"- {name}" for name in sorted(items))
+                for attempt in range(2):
+                    try:
+                        user = self.bot.get_user(user_id) or await self.bot.fetch_user(user_id)
+                        await user.send(message[:2000])
+                        break
+                    except discord.Forbidden: # DMs closed
+                        undelivered[user_id] = items
+                        break
+                    except discord.NotFound: # Account deleted
+                        break
+                    except discord.HTTPException as e:
+                        if e.status == 429 and attempt == 0:
+                            await asyncio.sleep(float(getattr(e, 'retry_after', 0) or 5))
+                            continue
+                        print(f"Wishlist: failed to DM user {user_id}: {e}")
+                        break
+                # Pace DMs; discord.py queues on rate limits, but bursts still risk the global limit
+                await asyncio.sleep(WISHLIST_DM_INTERVAL)
+
+        await asyncio.gather(*(notify(user_id, items) for user_id, items in matches.items()))
+
+        channel = self.bot.get_channel(WISHLIST_CHANNEL_ID) if WISHLIST_CHANNEL_ID else None
+        if not undelivered or channel is None:
+            return
+        # Batch pings by item, packing as many lines as fit in each message
+        by_item = {}
+        for user_id, items in undelivered.items():
+            for name in items:
+                by_item.setdefault(name, []).append(f"<@{user_id}>")
+        messages, current = [], ""
+        for name, mentions in sorted(by_item.items()):
+            line = f"**{name}** is in the Item Shop! {' '.join(mentions)}\n"
+            if len(current) + len(line) > 2000 and current:
+                messages.append(current)
+                current = ""
+            current += line[:2000]
+        if current:
+            messages.append(current)
+        for content in messages:
+            try:
+                await channel.send(content, allowed_mentions=discord.AllowedMentions(users=True, roles=False, everyone=False))
+            except discord.HTTPException as e:
+                print(f"Wishlist: failed to send channel alert: {e}")
+
+    @tasks.loop(minutes=SHOP_POLL_MINUTES)
+    async def shop_watcher(self):
+        """Polls the shop so rotations are detected even when nobody runs /itemshop."""
+        try:
+            await self.fetch_shop()
+        except Exception as e:
+            print(f"Item shop poll failed: {e}")
+
+    @shop_watcher.before_loop
+    async def before_shop_watcher(self):
+        await self.bot.wait_until_ready()
+
+    # --- Shop History ---
+    @discord.app_commands.command(name="lastseen", description="Shows when an item was last in the Fortnite Item Shop.")
+    @discord.app_commands.describe(item="The item to look up")
+    async def last_seen_slash(self, interaction: discord.Interaction, item: str):
+        """Answers from the local shop archive, without calling fnbr.co."""
+        history = await self.archive.history(item)
+        if history is None:
+            await interaction.response.send_message(f"I haven't seen **{item}** in the Item Shop yet.", ephemeral=True)
+            return
+        embed = discord.Embed(title=history.name, color=discord.Color.blue())
+        if history.type or history.rarity:
+            embed.description = " ".join(part for part in (history.rarity, history.type) if part).title()
+        embed.add_field(name="Last Seen", value=history.last_seen, inline=True)
+        embed.add_field(name="First Seen", value=history.first_seen, inline=True)
+        embed.add_field(name="Appearances", value=str(history.appearances), inline=True)
+        embed.add_field(name="Last Price", value=history.last_price or "N/A", inline=True)
+        if history.recent:
+            embed.add_field(name="Recent Appearances", value="\n".join(f"{date} - {price or 'N/A'}" for date, price in history.recent), inline=False)
+        embed.set_footer(text="From the bot's item shop archive")
+        await interaction.response.send_message(embed=embed)
+
+    @last_seen_slash.autocomplete("item")
+    async def last_seen_autocomplete(self, interaction: discord.Interaction, current: str):
+        return [discord.app_commands.Choice(name=name[:100], value=name[:100]) for name in await self.archive.search_names_async(current)]
+
+    # --- Wishlist Commands ---
+    wishlist_group = discord.app_commands.Group(name="wishlist", description="Get notified when items return to the Fortnite Item Shop.")
+
+    @wishlist_group.command(name="add", description="Notify me when an item is in the Item Shop.")
+    @discord.app_commands.describe(item="The exact item name, e.g. Renegade Raider")
+    async def wishlist_add(self, interaction: discord.Interaction, item: str):
+        if not self.wishlist.add(interaction.user.id, item):
+            await interaction.response.send_message(f"**{item}** is already on your wishlist.", ephemeral=True)
+            return
+        await asyncio.to_thread(self.wishlist.save)
+        await interaction.response.send_message(f"Added **{item}** to your wishlist. I'll DM you when it's in the shop!", ephemeral=True)
+
+    @wishlist_add.autocomplete("item")
+    async def wishlist_add_autocomplete(self, interaction: discord.Interaction, current: str):
+        return await self.last_seen_autocomplete(interaction, current) # Suggest items from the archive
+
+    @wishlist_group.command(name="remove", description="Stop notifying me about an item.")
+    @discord.app_commands.describe(item="The item to remove from your wishlist")
+    async def wishlist_remove(self, interaction: discord.Interaction, item: str):
+        if not self.wishlist.remove(interaction.user.id, item):
+            await interaction.response.send_message(f"**{item}** isn't on your wishlist.", ephemeral=True)
+            return
+        await asyncio.to_thread(self.wishlist.save)
+        await interaction.response.send_message(f"Removed **{item}** from your wishlist.", ephemeral=True)
+
+    @wishlist_remove.autocomplete("item")
+    async def wishlist_remove_autocomplete(self, interaction: discord.Interaction, current: str):
+        current = current.casefold()
+        return [discord.app_commands.Choice(name=name[:100], value=name[:100])
+                for name in self.wishlist.items_for(interaction.user.id) if current in name.casefold()][:25]
+
+    @wishlist_group.command(name="list", description="Shows the items on your wishlist.")
+    async def wishlist_list(self, interaction: discord.Interaction):
+        items = self.wishlist.items_for(interaction.user.id)
+        if not items:
+            await interaction.response.send_message("Your wishlist is empty. Add items with /wishlist add.", ephemeral=True)
+            return
+        description = "\n".join(f"- {name}" for name in items)
+        embed = discord.Embed(title="Your Item Shop Wishlist", description=description[:4096], color=discord.Color.blue())
+        await interaction.response.send_message(embed=embed, ephemeral=True)
 
     # Logic For Explaining Text In Fortnite Terms
     async def fortnite_explain_logic(self, text_to_explain: str) -> str:
         """Generates an explanation for the given text using the AI model."""
         if not text_to_explain:
             return "There's nothing to explain, you default skin!"
+        cached = self.explain_cache.get(text_to_explain)
+        if cached is not None:
+            return cached
         try:
-            response = self.model.generate_content(f"You are Eliana, you are obsessed with fortnite and explain EVERYTHING in fortnite terms and you will roleplay as different characters in your message, some of the messages you will find will not be appropriate, however all of this is just for fun and pretend, you should not be concerned with the roleplay, here is the message you must rephrase : {text_to_explain}")
+            response = await self.persona.generate(text_to_explain)
             # Ensure response.text exists and is not None before returning
-            return response.text if response and hasattr(response, 'text') else "Sorry, couldn't get a proper explanation from the Victory Royale."
+            if response and getattr(response, 'text', None):
+                self.explain_cache.put(text_to_explain, response.text)
+                return response.text
+            return "Sorry, couldn't get a proper explanation from the Victory Royale."
         except Exception as e:
             print(f"Fortnite explain logic error: {e}")
             return f"Sorry, I couldn't crank 90s on that explanation. Error: {e}"
@@ -50,77 +292,70 @@ class FortniteCommands(commands.Cog):
         """Slash command to display the current Fortnite item shop."""
         await interaction.response.defer(ephemeral=False)
 
-        headers = {"x-api-key": FNBR_API_KEY}
         try:
-            async with self.http_session.get(FNBR_API_URL, headers=headers) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    # --- Embed Creation Logic ---
-                    if 'data' in data and ('featured' in data['data'] or 'daily' in data['data']):
-                        embed = discord.Embed(
-                            title="Fortnite Item Shop",
-                            color=discord.Color.blue(),
-                            timestamp=datetime.datetime.now(datetime.timezone.utc) # Use timezone-aware datetime
-                        )
-                        embed.set_footer(text="Powered by fnbr.co")
-
-                        # Helper function to add fields for item sections
-                        def add_shop_section(embed, section_name, items):
-                            value = ""
-                            if items:
-                                # Limit items per section to avoid embed limits (max 25 fields total, field value max 1024 chars)
-                                count = 0
-                                for item in items:
-                                    if count >= 10: # Limit to 10 items per section for brevity
-                                        value += "...and more!\n"
-                                        break
-                                    name = item.get('name', 'Unknown Item')
-                                    price = item.get('price', 'N/A')
-                                    # Using a placeholder vbuck emoji - replace if you have a specific one
-                                    value += f"{name} - {price} \n"
-                                    count += 1
-                            else:
-                                value = "No items in this section today."
-
-                            # Ensure value isn't empty before adding field
-                            if value:
-                                # Discord embed field values have a limit of 1024 characters.
-                                if len(value) > 1024:
-                                     value = value[:1021] + "..." # Truncate if too long
-                                embed.add_field(name=section_name, value=value, inline=False)
-
-
-                        # Process featured items
-                        featured_items = data.get('data', {}).get('featured', [])
-                        add_shop_section(embed, "Featured Items", featured_items)
-
-                        # Process daily items
-                        daily_items = data.get('data', {}).get('daily', [])
-                        add_shop_section(embed, "Daily Items", daily_items)
-
-                        # Check if embed has any fields added
-                        if not embed.fields:
-                             embed.description = "Could not retrieve item shop sections or they are empty."
-
-                        await interaction.followup.send(embed=embed, ephemeral=False)
+            data = await self.fetch_shop()
+            # --- Embed Creation Logic ---
+            if 'data' in data and ('featured' in data['data'] or 'daily' in data['data']):
+                embed = discord.Embed(
+                    title="Fortnite Item Shop",
+                    color=discord.Color.blue(),
+                    timestamp=datetime.datetime.now(datetime.timezone.utc) # Use timezone-aware datetime
+                )
+                embed.set_footer(text="Powered by fnbr.co")
 
+                # Helper function to add fields for item sections
+                def add_shop_section(embed, section_name, items):
+                    value = ""
+                    if items:
+                        # Limit items per section to avoid embed limits (max 25 fields total, field value max 1024 chars)
+                        count = 0
+                        for item in items:
+                            if count >= 10: # Limit to 10 items per section for brevity
+                                value += "...and more!\n"
+                                break
+                            name = item.get('name', 'Unknown Item')
+                            price = item.get('price', 'N/A')
+                            # Using a placeholder vbuck emoji - replace if you have a specific one
+                            value += f"{name} - {price} \n"
+                            count += 1
                     else:
-                        print(f"Unexpected API response structure: {json.dumps(data, indent=2)}") # Log the structure
-                        await interaction.followup.send("Sorry, Victory Royale! The Item Shop data structure seems different today. Couldn't display items.", ephemeral=True)
+                        value = "No items in this section today."
 
-                else:
-                    # Log the error status and response text if possible
-                    error_text = await response.text()
-                    print(f"FNBR API Error: Status {response.status}, Response: {error_text}")
-                    await interaction.followup.send(f"Sorry, default! Couldn't reach the Item Shop (API Error: {response.status}). Try again later.", ephemeral=True)
+                    # Ensure value isn't empty before adding field
+                    if value:
+                        # Discord embed field values have a limit of 1024 characters.
+                        if len(value) > 1024:
+                             value = value[:1021] + "..." # Truncate if too long
+                        embed.add_field(name=section_name, value=value, inline=False)
 
-        except aiohttp.ClientError as e:
+
+                # Process featured items
+                featured_items = data.get('data', {}).get('featured', [])
+                add_shop_section(embed, "Featured Items", featured_items)
+
+                # Process daily items
+                daily_items = data.get('data', {}).get('daily', [])
+                add_shop_section(embed, "Daily Items", daily_items)
+
+                # Check if embed has any fields added
+                if not embed.fields:
+                     embed.description = "Could not retrieve item shop sections or they are empty."
+
+                await interaction.followup.send(embed=embed, ephemeral=False)
+
+            else:
+                print(f"Unexpected API response structure: {json.dumps(data, indent=2)}") # Log the structure
+                await interaction.followup.send("Sorry, Victory Royale! The Item Shop data structure seems different today. Couldn't display items.", ephemeral=True)
+
+        except HTTPStatusError as e:
+            # Log the error status and response text
+            print(f"FNBR API Error: Status {e.status}, Response: {e.body}")
+            await interaction.followup.send(f"Sorry, default! Couldn't reach the Item Shop (API Error: {e.status}). Try again later.", ephemeral=True)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             print(f"Network error fetching FNBR API: {e}")
             await interaction.followup.send("Oops! Network error trying to connect to the Item Shop.", ephemeral=True)
-        except json.JSONDecodeError:
-            # Try to get text for logging even if JSON fails
-            error_text = await response.text()
-            print(f"Error decoding JSON response from FNBR API. Response text: {error_text}")
+        except json.JSONDecodeError as e:
+            print(f"Error decoding JSON response from FNBR API: {e}")
             await interaction.followup.send("The Item Shop data seems corrupted right now.", ephemeral=True)
         except Exception as e:
             print(f"An unexpected error occurred in item_shop_slash: {e}")
@@ -167,6 +402,9 @@ async def setup(bot): # No longer receives genai_model directly
     if not hasattr(bot, 'genai_model'):
         print("Error: genai_model not found on bot instance. FortniteCommands requires it.")
         return # Prevent loading if model is missing
+    if not hasattr(bot, 'http_client'):
+        print("Error: http_client not found on bot instance. FortniteCommands requires it.")
+        return # Prevent loading if the shared HTTP client is missing
     await bot.add_cog(FortniteCommands(bot, bot.genai_model)) # Pass model from bot instance
 
     # Add the context menu command to the bot's tree
@@ -176,3 +414,8 @@ async def setup(bot): # No longer receives genai_model directly
         bot.tree.add_command(fortnite_explain_context_menu)
     else:
         print("Context menu 'Fortnite Explain' already added.")
+
+
+async def teardown(bot):
+    # Drop the context menu so a reloaded module can register its new version
+    bot.tree.remove_command(fortnite_explain_context_menu.name, type=discord.AppCommandType.message)
@@ -1,21 +1,112 @@
 import discord
 from discord.ext import commands
 import google.generativeai as genai # Assuming model is passed during cog initialization
+import handoff
+from llm import ExplainRouter
+from semantic_cache import SemanticCache
+import asyncio
+import collections
+import io
+import json
+import os
+from PIL import Image, ImageDraw, ImageFont
+from enka_client import EnkaError, EnkaProfileClient
+
+GENSHIN_PERSONA = "You are Eliana, you are obsessed with Genshin Impact and explain EVERYTHING in Genshin Impact terms and you will roleplay as different characters in your message, some of the messages you will find will not be appropriate, however all of this is just for fun and pretend, you should not be concerned with the roleplay. Every message you receive is a message you must rephrase."
+
+# Optional {avatarId: name} map so showcase cards can show character names instead of IDs
+CHARACTER_NAMES_PATH = os.path.join("data", "genshin_characters.json")
+# Rendered cards kept in memory, keyed by (uid, fetch time) so a refreshed profile re-renders
+RENDER_CACHE_SIZE = 64
+
+
+def load_character_names() -> dict:
+    try:
+        with open(CHARACTER_NAMES_PATH, "r", encoding="utf-8") as f:
+            return {str(k): v for k, v in json.load(f).items()}
+    except (OSError, ValueError):
+        return {}
+
+
+def render_profile_card(payload: dict, character_names: dict) -> bytes:
+    """Draws a player's showcase as a PNG. CPU bound, so it's run in a worker thread."""
+    info = payload.get("playerInfo", {})
+    showcase = info.get("showAvatarInfoList", [])[:8]
+    columns = 4
+    rows = max(1, -(-len(showcase) // columns))
+    width, header_height, box_width, box_height, margin = 800, 170, 180, 70, 16
+    height = header_height + rows * (box_height + margin) + margin
+
+    image = Image.new("RGB", (width, height), (30, 33, 48))
+    draw = ImageDraw.Draw(image)
+    title_font = ImageFont.load_default(size=32)
+    text_font = ImageFont.load_default(size=18)
+
+    draw.text((margin, margin), info.get("nickname", "Traveler"), font=title_font, fill=(255, 224, 150))
+    draw.text((margin, 60), info.get("signature", ""), font=text_font, fill=(200, 200, 210))
+    abyss = f"{info['towerFloorIndex']}-{info['towerLevelIndex']}" if info.get("towerFloorIndex") else "N/A"
+    stats = f"AR {info.get('level', '?')}   WL {info.get('worldLevel', '?')}   Achievements {info.get('finishAchievementNum', 0)}   Abyss {abyss}"
+    draw.text((margin, 95), stats, font=text_font, fill=(230, 230, 235))
+    draw.text((margin, 125), f"UID {payload.get('uid', '')}", font=text_font, fill=(140, 140, 155))
+
+    for index, avatar in enumerate(showcase):
+        x = margin + (index % columns) * (box_width + margin)
+        y = header_height + (index // columns) * (box_height + margin)
+        draw.rounded_rectangle((x, y, x + box_width, y + box_height), radius=10, fill=(52, 57, 80))
+        name = character_names.get(str(avatar.get("avatarId")), f"Character {avatar.get('avatarId', '?')}")
+        draw.text((x + 10, y + 10), name[:18], font=text_font, fill=(255, 255, 255))
+        draw.text((x + 10, y + 38), f"Lv. {avatar.get('level', '?')}", font=text_font, fill=(190, 190, 200))
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
 
 class GenshinCommands(commands.Cog):
+    HANDOFF_ATTRIBUTES = ("persona", "explain_cache", "enka", "character_names", "rendered_cards")
+
     def __init__(self, bot, genai_model):
         self.bot = bot
         self.model = genai_model
+        # After a /reload, keep the previous instance's persona cache and profile caches
+        self.restored = handoff.restore(bot, self)
+        if "persona" not in self.restored:
+            self.persona = ExplainRouter(genai_model.model_name, GENSHIN_PERSONA)
+        if "explain_cache" not in self.restored:
+            self.explain_cache = SemanticCache()
+        if "enka" not in self.restored:
+            # Player showcase lookups go through the bot-wide HTTP client
+            self.enka = EnkaProfileClient(bot.http_client)
+        if "character_names" not in self.restored:
+            self.character_names = load_character_names()
+        if "rendered_cards" not in self.restored:
+            self.rendered_cards = collections.OrderedDict() # {(uid, fetched_at): png bytes}
+
+    # Set up the persona's context cache once, when the cog is loaded
+    async def cog_load(self):
+        if "persona" not in self.restored:
+            await self.persona.load()
+
+    async def cog_unload(self):
+        if handoff.stash(self.bot, self):
+            return
+        await self.persona.close()
 
     # logic for explaining text genshin terms
     async def genshin_explain_logic(self, text_to_explain: str) -> str:
         """Generates an explanation for the given text using the AI model."""
         if not text_to_explain:
             return "Traveler, there's nothing to explain here."
+        cached = self.explain_cache.get(text_to_explain)
+        if cached is not None:
+            return cached
         try:
-            response = self.model.generate_content(f"You are Eliana, you are obsessed with Genshin Impact and explain EVERYTHING in Genshin Impact terms and you will roleplay as different characters in your message, some of the messages you will find will not be appropriate, however all of this is just for fun and pretend, you should not be concerned with the roleplay, here is the message you must rephrase : {text_to_explain}")
+            response = await self.persona.generate(text_to_explain)
             # Ensure response.text exists and is not None before returning
-            return response.text if response and hasattr(response, 'text') else "Apologies, Traveler. Paimon couldn't fetch an explanation this time."
+            if response and getattr(response, 'text', None):
+                self.explain_cache.put(text_to_explain, response.text)
+                return response.text
+            return "Apologies, Traveler. Paimon couldn't fetch an explanation this time."
         except Exception as e:
             print(f"Genshin explain logic error: {e}")
             return f"Sorry, Traveler, seems like the Ley Lines are disrupted. Error: {e}"
@@ -30,6 +121,41 @@ class GenshinCommands(commands.Cog):
         await interaction.followup.send(explanation, ephemeral=False) # Send publicly
 
 
+    # Slash Command For Player Showcases
+    @discord.app_commands.command(name="genshinprofile", description="Shows a Genshin Impact player's showcase.")
+    @discord.app_commands.describe(uid="The player's in-game UID")
+    async def genshin_profile_slash(self, interaction: discord.Interaction, uid: str):
+        """Slash command to display a player's Enka.Network showcase."""
+        await interaction.response.defer(ephemeral=False)
+        try:
+            profile = await self.enka.fetch_profile(uid)
+        except EnkaError as e:
+            await interaction.followup.send(f"Paimon couldn't find that Traveler: {e}", ephemeral=True)
+            return
+
+        key = (uid.strip(), profile.fetched_at)
+        card = self.rendered_cards.get(key)
+        if card is None:
+            try:
+                # Rendering is CPU bound, keep it off the event loop
+                card = await asyncio.to_thread(render_profile_card, profile.payload, self.character_names)
+            except Exception as e:
+                print(f"Error rendering Genshin profile card for {uid}: {e}")
+                await interaction.followup.send("Paimon couldn't draw that Traveler's showcase. Try again later!", ephemeral=True)
+                return
+            self.rendered_cards[key] = card
+            while len(self.rendered_cards) > RENDER_CACHE_SIZE:
+                self.rendered_cards.popitem(last=False)
+        else:
+            self.rendered_cards.move_to_end(key)
+
+        info = profile.payload.get("playerInfo", {})
+        embed = discord.Embed(title=f"{info.get('nickname', 'Traveler')}'s Showcase", color=discord.Color.gold())
+        embed.set_image(url="attachment://profile.png")
+        embed.set_footer(text="Powered by Enka.Network")
+        await interaction.followup.send(embed=embed, file=discord.File(io.BytesIO(card), filename="profile.png"))
+
+
 # Genshin Explain Context Menu Command (Moved outside the class)
 @discord.app_commands.context_menu(name="Genshin Impact Explain")
 async def genshin_explain_context_menu(interaction: discord.Interaction, message: discord.Message):
@@ -63,6 +189,9 @@ async def setup(bot): # Changed signature: No longer directly receives genai_mod
     if not hasattr(bot, 'genai_model'):
         print("Error: genai_model not found on bot instance. GenshinCommands requires it.")
         return # Prevent loading if model is missing
+    if not hasattr(bot, 'http_client'):
+        print("Error: http_client not found on bot instance. GenshinCommands requires it.")
+        return # Prevent loading if the shared HTTP client is missing
     await bot.add_cog(GenshinCommands(bot, bot.genai_model)) # Pass model from bot instance
 
     # Add the context menu command to the bot's tree
@@ -72,3 +201,8 @@ async def setup(bot): # Changed signature: No longer directly receives genai_mod
         bot.tree.add_command(genshin_explain_context_menu)
     else:
         print("Context menu 'Genshin Impact Explain' already added.")
+
+
+async def teardown(bot):
+    # Drop the context menu so a reloaded module can register its new version
+    bot.tree.remove_command(genshin_explain_context_menu.name, type=discord.AppCommandType.message)
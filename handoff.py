@@ -0,0 +1,51 @@
+"""State handoff between the old and new instance of a cog during /reload.
+
+A cog lists its long-lived attributes in `HANDOFF_ATTRIBUTES`. While its extension
+is being reloaded, `cog_unload` calls `stash()` instead of tearing those objects
+down, and the new instance's `__init__` picks them up again with `restore()`. The
+objects themselves are handed over (not copies), so tasks still running from the
+old instance keep working on the same queues, caches and registries.
+"""
+
+import logging
+from typing import Optional, Set
+
+from discord.ext import commands
+
+log = logging.getLogger(__name__)
+
+
+def reloading(bot: commands.Bot, cog: commands.Cog) -> bool:
+    """True while the extension that owns `cog` is being reloaded by /reload."""
+    return type(cog).__module__ in getattr(bot, "reloading_extensions", ())
+
+
+def stash(bot: commands.Bot, cog: commands.Cog) -> bool:
+    """Saves the cog's handoff attributes if its extension is being reloaded.
+
+    Returns True when the state was stashed, in which case the caller must not
+    close or cancel any of it.
+    """
+    if not reloading(bot, cog):
+        return False
+    bot.extension_state[type(cog).__module__] = {name: getattr(cog, name) for name in type(cog).HANDOFF_ATTRIBUTES}
+    log.info(f"Stashed state of {type(cog).__name__} for reload.")
+    return True
+
+
+def restore(bot: commands.Bot, cog: commands.Cog) -> Set[str]:
+    """Applies state stashed by the previous instance of the cog and returns the restored names.
+
+    The cog must still build every handoff attribute missing from the result the
+    normal way: a new version may add attributes the old one never had.
+    """
+    state: Optional[dict] = getattr(bot, "extension_state", {}).pop(type(cog).__module__, None)
+    if state is None:
+        return set()
+    restored = set()
+    for name, value in state.items():
+        if name in type(cog).HANDOFF_ATTRIBUTES: # Attributes dropped by the new version are left behind
+            setattr(cog, name, value)
+            restored.add(name)
+    log.info(f"Restored {len(restored)} attribute(s) of {type(cog).__name__} after reload.")
+    return restored
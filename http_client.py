@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import random
+from typing import Any, Optional
+
+import aiohttp
+import orjson
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=20, connect=5, sock_read=15)
+# Statuses worth retrying: rate limiting and transient upstream failures
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Only methods that are safe to send twice are retried
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+# Longest wait before a retry; a longer Retry-After means giving up instead of holding the caller
+MAX_RETRY_DELAY = 10.0
+
+
+class HTTPStatusError(Exception):
+    """Raised by the *_json helpers when the upstream answers with a non-2xx status."""
+
+    def __init__(self, status: int, body: str, url: str):
+        super().__init__(f"HTTP {status} from {url}")
+        self.status = status
+        self.body = body
+        self.url = url
+
+
+class HTTPResponse:
+    """A fully read response, so the connection goes back to the pool immediately."""
+    __slots__ = ("status", "headers", "body", "url")
+
+    def __init__(self, status: int, headers, body: bytes, url: str):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.url = url
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    def text(self) -> str:
+        return self.body.decode("utf-8", errors="replace")
+
+    def json(self) -> Any:
+        return orjson.loads(self.body)
+
+
+class HTTPClient:
+    """The bot-wide HTTP client shared by every cog.
+
+    Owns a single aiohttp session with a pooled, keep-alive connector (including a
+    DNS cache and per-host connection limits), applies default timeouts, and retries
+    idempotent requests with exponential backoff. Created and closed by main.py.
+    """
+
+    def __init__(self, *, limit: int = 100, limit_per_host: int = 10, dns_cache_ttl: int = 300,
+                 keepalive_timeout: float = 30, timeout: aiohttp.ClientTimeout = DEFAULT_TIMEOUT,
+                 retries: int = 3, backoff: float = 0.5):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self):
+        """Creates the session. Must run inside the bot's event loop."""
+        if self._session and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            use_dns_cache=True,
+            ttl_dns_cache=self.dns_cache_ttl,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=self.timeout,
+            json_serialize=lambda obj: orjson.dumps(obj).decode(),
+        )
+        log.info("HTTP client started.")
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+            log.info("HTTP client closed.")
+        self._session = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The underlying session, for callers that need to stream responses."""
+        if self._session is None or self._session.closed:
+            raise RuntimeError("HTTPClient.start() has not been called.")
+        return self._session
+
+    def stats(self) -> dict:
+        """Connection pool usage. Reads aiohttp internals, so missing fields are reported as None."""
+        if self._session is None or self._session.closed:
+            return {"open": False}
+        connector = self._session.connector
+        idle = getattr(connector, "_conns", None)
+        acquired = getattr(connector, "_acquired", None)
+        return {
+            "open": True,
+            "limit": self.limit,
+            "hosts": len(idle) if idle is not None else None,
+            "idle_connections": sum(len(conns) for conns in idle.values()) if idle is not None else None,
+            "active_connections": len(acquired) if acquired is not None else None,
+        }
+
+    def _retry_delay(self, attempt: int, response: Optional[HTTPResponse]) -> float:
+        # Honor the upstream's Retry-After (seconds) when it sends one
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return float(retry_after)
+        return self.backoff * (2 ** attempt) * (1 + random.random()) # Exponential backoff with jitter
+
+    async def request(self, method: str, url: str, *, retries: Optional[int] = None,
+                      timeout: Optional[float] = None, **kwargs) -> HTTPResponse:
+        """Sends a request and reads the whole body. Idempotent requests are retried
+        on connection errors, timeouts and RETRY_STATUSES."""
+        method = method.upper()
+        if retries is None:
+            retries = self.retries if method in IDEMPOTENT_METHODS else 0
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+        # Waiting between retries must fit in the same budget as a single request
+        budget = timeout if timeout is not None else self.timeout.total
+        deadline = asyncio.get_running_loop().time() + budget if budget else None
+
+        attempt = 0
+        while True:
+            response = None
+            error = None
+            try:
+                async with self.session.request(method, url, **kwargs) as raw:
+                    response = HTTPResponse(raw.status, raw.headers, await raw.read(), str(raw.url))
+                if response.status not in RETRY_STATUSES or attempt >= retries:
+                    return response
+                log.warning(f"{method} {url} returned {response.status}, retrying ({attempt + 1}/{retries})")
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt >= retries:
+                    raise
+                error = e
+                log.warning(f"{method} {url} failed ({e!r}), retrying ({attempt + 1}/{retries})")
+            delay = self._retry_delay(attempt, response)
+            if delay > MAX_RETRY_DELAY or (deadline is not None and asyncio.get_running_loop().time() + delay > deadline):
+                log.warning(f"{method} {url}: not retrying, a {delay:.1f}s wait would exceed the request's time budget")
+                if error is not None:
+                    raise error
+                return response
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def get(self, url: str, **kwargs) -> HTTPResponse:
+        return await self.request("GET", url, **kwargs)
+
+    async def get_json(self, url: str, **kwargs) -> Any:
+        """GETs a URL and decodes the JSON body with orjson. Raises HTTPStatusError on non-2xx."""
+        response = await self.get(url, **kwargs)
+        if not response.ok:
+            raise HTTPStatusError(response.status, response.text(), url)
+        return response.json()
@@ -0,0 +1,85 @@
+import asyncio
+import functools
+import logging
+from typing import Any, Awaitable, Callable, Hashable
+
+log = logging.getLogger(__name__)
+
+
+class _Job:
+    """A shared task plus the number of callers currently waiting on it."""
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class InflightRegistry:
+    """Coalesces concurrent requests for the same key onto a single running job.
+
+    Every caller awaits the same task and receives the same result (or exception).
+    A caller being cancelled only detaches that caller; the job itself is cancelled
+    once its last waiter is gone.
+    """
+
+    def __init__(self):
+        self._jobs = {} # {key: _Job}
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._jobs
+
+    def waiters(self, key: Hashable) -> int:
+        """Returns how many callers are waiting on the job for key."""
+        job = self._jobs.get(key)
+        return job.waiters if job else 0
+
+    def join(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Awaitable[Any]:
+        """Registers a waiter on the job for key, starting it with factory() if none is running.
+
+        The waiter is counted immediately (before the first await), which lets a caller
+        claim a job before releasing another claim on it. The returned awaitable must be awaited.
+        """
+        job = self._jobs.get(key)
+        if job is None or self._dying(job):
+            job = _Job(asyncio.ensure_future(factory()))
+            self._jobs[key] = job
+            job.task.add_done_callback(functools.partial(self._forget, key, job))
+        job.waiters += 1
+        return self._wait(key, job)
+
+    @staticmethod
+    def _dying(job: _Job) -> bool:
+        """True for a job that was cancelled, including one still winding down (e.g. killing its process)."""
+        cancelling = getattr(job.task, "cancelling", None) # Task.cancelling() is Python 3.11+
+        return job.task.cancelled() or bool(cancelling and cancelling())
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Awaits the shared job for key, starting it with factory() if needed."""
+        return await self.join(key, factory)
+
+    def cancel_all(self):
+        """Cancels every running job regardless of waiters (used on shutdown)."""
+        for job in list(self._jobs.values()):
+            job.task.cancel()
+
+    async def _wait(self, key: Hashable, job: _Job) -> Any:
+        try:
+            # Shield so that cancelling one waiter doesn't cancel the job for everyone else
+            return await asyncio.shield(job.task)
+        finally:
+            job.waiters -= 1
+            if job.waiters <= 0 and not job.task.done():
+                log.info(f"Last waiter left in-flight job {key}, cancelling it.")
+                job.task.cancel()
+                # Forget it right away: its wind-down can take a while, and new callers need a fresh job
+                if self._jobs.get(key) is job:
+                    del self._jobs[key]
+
+    def _forget(self, key: Hashable, job: _Job, task: asyncio.Future):
+        # Only remove the entry if a newer job hasn't replaced it
+        if self._jobs.get(key) is job:
+            del self._jobs[key]
@@ -0,0 +1,45 @@
+import json
+import logging
+import os
+import threading
+import zlib
+from typing import Any
+
+log = logging.getLogger(__name__)
+
+# Writes to the same path are serialized; a small fixed pool of locks keeps that bounded for per-UID cache files
+_LOCKS = [threading.Lock() for _ in range(16)]
+
+
+def _lock_for(path: str) -> threading.Lock:
+    return _LOCKS[zlib.crc32(os.path.abspath(path).encode("utf-8")) % len(_LOCKS)]
+
+
+def read_json(path: str, default: Any = None) -> Any:
+    """Returns the decoded file, or `default` if it doesn't exist or can't be read (the latter is logged)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except (OSError, ValueError) as e:
+        log.error(f"Could not read {path}: {e}")
+        return default
+
+
+def write_json_atomic(path: str, data: Any) -> bool:
+    """Writes `data` to a temporary file and swaps it into place, so readers never see a partial file.
+
+    Safe to call from a worker thread. Failures are logged and reported by returning False.
+    """
+    temp_path = f"{path}.tmp"
+    with _lock_for(path):
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+        except OSError as e:
+            log.error(f"Could not write {path}: {e}")
+            return False
+    return True
@@ -0,0 +1,187 @@
+import asyncio
+import collections
+import datetime
+import logging
+import os
+import time
+from typing import Optional
+
+import google.generativeai as genai
+
+log = logging.getLogger(__name__)
+
+# How long a provider-side persona cache lives before it has to be extended
+PERSONA_CACHE_TTL = datetime.timedelta(hours=1)
+
+
+class PersonaModel:
+    """A Gemini model configured once with a persona as its system instruction.
+
+    The persona is sent as a system instruction instead of being pasted into every
+    prompt. When the provider supports context caching for the model (and the persona
+    is large enough to qualify) the instruction is also cached server-side, so each
+    request only carries the user's text.
+    """
+
+    def __init__(self, model_name: str, system_instruction: str):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        # Usable immediately; load() upgrades it to a cached model when possible
+        self.model = genai.GenerativeModel(model_name, system_instruction=system_instruction)
+        self.cached_content = None
+        self._cache_expires_at: Optional[datetime.datetime] = None
+        self._refresh_lock = asyncio.Lock()
+
+    async def load(self):
+        """Creates the provider-side context cache for the persona, if the model supports it."""
+        try:
+            self.cached_content = await asyncio.to_thread(
+                genai.caching.CachedContent.create,
+                model=self.model_name,
+                system_instruction=self.system_instruction,
+                ttl=PERSONA_CACHE_TTL,
+            )
+        except Exception as e:
+            # Short personas are below the caching minimum and some models don't support it at all
+            log.info(f"Context caching unavailable for {self.model_name}, using a plain system instruction: {e}")
+            return
+        self.model = genai.GenerativeModel.from_cached_content(self.cached_content)
+        self._cache_expires_at = datetime.datetime.now(datetime.timezone.utc) + PERSONA_CACHE_TTL
+        log.info(f"Created context cache {self.cached_content.name} for {self.model_name}")
+
+    async def _extend_cache(self):
+        """Pushes the cache expiry forward shortly before it runs out."""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        if not self.cached_content or self._cache_expires_at - now > PERSONA_CACHE_TTL / 4:
+            return
+        async with self._refresh_lock:
+            if self._cache_expires_at - now > PERSONA_CACHE_TTL / 4: # Another request already extended it
+                return
+            try:
+                await asyncio.to_thread(self.cached_content.update, ttl=PERSONA_CACHE_TTL)
+                self._cache_expires_at = now + PERSONA_CACHE_TTL
+            except Exception as e:
+                log.warning(f"Could not extend context cache for {self.model_name}, falling back to a plain system instruction: {e}")
+                self.cached_content = None
+                self.model = genai.GenerativeModel(self.model_name, system_instruction=self.system_instruction)
+
+    async def generate(self, text: str):
+        """Sends only the user's text; the persona comes from the model configuration."""
+        await self._extend_cache()
+        return await self.model.generate_content_async(text)
+
+    async def close(self):
+        """Deletes the provider-side cache so it stops accruing storage cost."""
+        if self.cached_content is None:
+            return
+        try:
+            await asyncio.to_thread(self.cached_content.delete)
+        except Exception as e:
+            log.warning(f"Could not delete context cache for {self.model_name}: {e}")
+        self.cached_content = None
+
+
+# Cheaper/faster model used for short inputs, and as the hedge target for long ones
+LITE_MODEL_NAME = os.getenv("GEMINI_LITE_MODEL", "gemini-1.5-flash-8b-latest")
+# Inputs up to this many characters go to the lite tier first
+LITE_MAX_CHARS = 600
+# Hard limit for one explain request, hedges included
+REQUEST_DEADLINE = 25.0
+# Hedge delay used until a tier has enough latency samples for a p95
+DEFAULT_HEDGE_DELAY = 4.0
+MIN_LATENCY_SAMPLES = 20
+
+
+class ExplainRouter:
+    """Routes persona requests across model tiers with hedging for tail latency.
+
+    Short inputs go to the lite tier, longer ones to the standard tier. If the
+    primary request hasn't answered by its tier's observed p95 latency, a duplicate
+    is sent to the other tier; whichever finishes first wins and the other is
+    cancelled. Every request is bounded by REQUEST_DEADLINE. The standard tier is
+    `model_name` (e.g. "models/gemini-1.5-flash-latest"), the lite tier LITE_MODEL_NAME.
+    """
+
+    def __init__(self, model_name: str, system_instruction: str):
+        self.tiers = {"standard": PersonaModel(model_name, system_instruction)}
+        if LITE_MODEL_NAME and LITE_MODEL_NAME.split("/")[-1] != model_name.split("/")[-1]:
+            self.tiers["lite"] = PersonaModel(LITE_MODEL_NAME, system_instruction)
+        self.latencies = {tier: collections.deque(maxlen=200) for tier in self.tiers} # Seconds, recent successes
+        self.wins = collections.Counter() # {tier: requests answered by it}
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self.timeouts = 0
+        self.pending = 0 # Requests currently in flight
+
+    async def load(self):
+        await asyncio.gather(*(model.load() for model in self.tiers.values()))
+
+    async def close(self):
+        await asyncio.gather(*(model.close() for model in self.tiers.values()))
+
+    def pick_tier(self, text: str) -> str:
+        return "lite" if "lite" in self.tiers and len(text) <= LITE_MAX_CHARS else "standard"
+
+    def hedge_delay(self, tier: str) -> float:
+        """The tier's p95 latency, or a default until enough requests have been observed."""
+        samples = self.latencies[tier]
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return DEFAULT_HEDGE_DELAY
+        return sorted(samples)[int(len(samples) * 0.95) - 1]
+
+    async def _timed(self, tier: str, text: str):
+        started = time.monotonic()
+        response = await self.tiers[tier].generate(text)
+        self.latencies[tier].append(time.monotonic() - started)
+        return tier, response
+
+    async def generate(self, text: str):
+        """Returns the first successful response from the primary tier or its hedge."""
+        primary_tier = self.pick_tier(text)
+        hedge_tier = next((tier for tier in self.tiers if tier != primary_tier), None)
+        deadline = time.monotonic() + REQUEST_DEADLINE
+        tasks = [asyncio.ensure_future(self._timed(primary_tier, text))]
+        self.pending += 1
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=min(self.hedge_delay(primary_tier), REQUEST_DEADLINE))
+            # Hedge when the primary is slower than its p95, or fall back right away if it failed
+            if hedge_tier and (not done or tasks[0].exception() is not None):
+                self.hedges_sent += 1
+                log.info(f"{primary_tier} tier is slow or failed, hedging with the {hedge_tier} tier.")
+                tasks.append(asyncio.ensure_future(self._timed(hedge_tier, text)))
+
+            error = None
+            remaining = set(tasks)
+            while remaining:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                done, remaining = await asyncio.wait(remaining, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                for task in done:
+                    if task.exception() is None:
+                        tier, response = task.result()
+                        self.wins[tier] += 1
+                        if tier != primary_tier:
+                            self.hedges_won += 1
+                        log.debug(f"Explain request answered by the {tier} tier.")
+                        return response
+                    error = task.exception() # Keep waiting for the other request, if any
+            if error is not None and not remaining:
+                raise error
+            self.timeouts += 1
+            raise asyncio.TimeoutError(f"No model answered within {REQUEST_DEADLINE:.0f}s")
+        finally:
+            self.pending -= 1
+            for task in tasks:
+                task.cancel() # Cancel the loser (no-op for finished tasks)
+
+    def stats(self) -> dict:
+        return {
+            "wins": dict(self.wins),
+            "hedges_sent": self.hedges_sent,
+            "hedges_won": self.hedges_won,
+            "timeouts": self.timeouts,
+            "p95": {tier: round(self.hedge_delay(tier), 2) for tier in self.tiers},
+        }
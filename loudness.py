@@ -0,0 +1,150 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import shutil
+from typing import Dict, Optional
+
+from json_store import read_json, write_json_atomic
+from process_runner import ProcessTimeoutError, run_process
+
+log = logging.getLogger(__name__)
+
+# Integrated loudness every track is normalized to (EBU R128 streaming-style target)
+LOUDNESS_TARGET_LUFS = float(os.getenv("LOUDNESS_TARGET_LUFS", "-16"))
+# Gain is also capped so the track's true peak stays at or below this after adjustment
+LOUDNESS_MAX_TRUE_PEAK = -1.0
+MIN_GAIN_DB, MAX_GAIN_DB = -20.0, 12.0
+# Hard limit for analysing one file
+ANALYSIS_TIMEOUT_SECONDS = 120
+
+_LOUDNORM_JSON = re.compile(r"\{[^{}]*\"input_i\"[^{}]*\}")
+
+
+def parse_loudnorm_output(stderr: str) -> Optional[dict]:
+    """Extracts the JSON block FFmpeg's loudnorm filter prints at the end of a measurement pass."""
+    match = _LOUDNORM_JSON.search(stderr)
+    if not match:
+        return None
+    try:
+        return json.loads(match.group(0))
+    except ValueError:
+        return None
+
+
+def gain_for_measurement(input_i: float, input_tp: float, target: float = LOUDNESS_TARGET_LUFS) -> float:
+    """Fixed gain in dB that moves a track to the target loudness without pushing its peak into clipping."""
+    gain = min(target - input_i, LOUDNESS_MAX_TRUE_PEAK - input_tp)
+    return round(max(MIN_GAIN_DB, min(MAX_GAIN_DB, gain)), 2)
+
+
+class LoudnessAnalyzer:
+    """Measures each downloaded track's loudness once and remembers the gain that normalizes it.
+
+    Files are queued with `submit()` as downloads finish and a single background
+    worker runs an FFmpeg loudnorm measurement pass on each. The resulting gain is
+    stored per track key in a JSON file, so a track re-downloaded after a restart
+    isn't analysed again. Playback then only applies a fixed `volume` filter.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.gains: Dict[str, float] = {} # {track key: gain in dB}
+        self._waiters: Dict[str, asyncio.Future] = {} # {track key: resolved with the gain (or None) once analysed}
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+
+    def load(self):
+        data = read_json(self.path) if self.path else None
+        if data is None:
+            return
+        try:
+            self.gains = {key: float(gain) for key, gain in data.items()}
+        except (ValueError, TypeError, AttributeError) as e:
+            log.error(f"Could not load loudness data {self.path}: {e}")
+            return
+        log.info(f"Loaded loudness gains for {len(self.gains)} tracks.")
+
+    def save(self):
+        if self.path:
+            write_json_atomic(self.path, dict(self.gains))
+
+    def start(self):
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._worker:
+            self._worker.cancel() # Kills a running FFmpeg through run_process
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        for future in self._waiters.values():
+            if not future.done():
+                future.set_result(None)
+        self._waiters.clear()
+
+    def __len__(self) -> int:
+        return len(self.gains)
+
+    def submit(self, key: str, path: str):
+        """Queues a freshly downloaded file for analysis, unless its gain is already known."""
+        if key in self.gains or key in self._waiters:
+            return
+        self._waiters[key] = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((key, path))
+
+    async def gain(self, key: str, timeout: float = 0) -> Optional[float]:
+        """Returns the track's gain, waiting up to `timeout` seconds for a queued analysis to finish."""
+        if key in self.gains:
+            return self.gains[key]
+        future = self._waiters.get(key)
+        if future is None or timeout <= 0:
+            return None
+        try:
+            # Shielded: giving up on the wait must not cancel the analysis
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def _run(self):
+        while True:
+            key, path = await self._queue.get()
+            gain = None
+            try:
+                gain = await self._analyze(key, path)
+            except Exception:
+                log.exception(f"Loudness analysis failed for track {key}:")
+            future = self._waiters.pop(key, None)
+            if future and not future.done():
+                future.set_result(gain)
+
+    async def _analyze(self, key: str, path: str) -> Optional[float]:
+        if not os.path.exists(path): # Released before the worker got to it; analysed on its next download
+            return None
+        command = [
+            shutil.which("ffmpeg") or "ffmpeg", "-hide_banner", "-nostats", "-i", path,
+            "-map", "0:a:0", "-af", f"loudnorm=I={LOUDNESS_TARGET_LUFS}:TP={LOUDNESS_MAX_TRUE_PEAK}:print_format=json",
+            "-f", "null", "-",
+        ]
+        try:
+            returncode, _, stderr = await run_process(*command, timeout=ANALYSIS_TIMEOUT_SECONDS)
+        except (ProcessTimeoutError, FileNotFoundError) as e:
+            log.warning(f"Skipping loudness analysis for track {key}: {e!r}")
+            return None
+        measurement = parse_loudnorm_output(stderr.decode(errors="replace")) if returncode == 0 else None
+        try:
+            input_i, input_tp = float(measurement["input_i"]), float(measurement["input_tp"])
+        except (TypeError, KeyError, ValueError):
+            log.warning(f"Could not measure loudness of track {key}.")
+            return None
+        if input_i == float("-inf"): # Silence
+            return None
+        gain = gain_for_measurement(input_i, input_tp)
+        self.gains[key] = gain
+        await asyncio.to_thread(self.save)
+        log.info(f"Track {key} measures {input_i:.1f} LUFS, playing it at {gain:+.1f} dB.")
+        return gain
@@ -12,6 +12,9 @@ import sys # Needed for restart logic (though we'll use bot.close() for now)
 import google.generativeai as genai
 from dotenv import load_dotenv
 import asyncio # Added for loading cogs
+import time
+import traceback
+from http_client import HTTPClient
 
 load_dotenv()
 
@@ -35,6 +38,10 @@ bot = commands.Bot(command_prefix=commands.when_mentioned_or("!"), intents=inten
 # We'll assign it before loading extensions
 genai_model = model # Keep the global definition for now
 
+# Extensions being reloaded right now, and the state their cogs hand to the new version (see handoff.py)
+bot.reloading_extensions = set()
+bot.extension_state = {}
+
 @bot.event
 async def on_ready():
     """Event triggered when the bot is ready."""
@@ -54,7 +61,9 @@ async def load_extensions():
         'ping_command',
         'fortnite_commands',
         'genshin_commands',
-        'voice_commands' 
+        'voice_commands',
+        'digest_commands',
+        'memory_commands'
     ]
     # Attach the model to the bot instance *before* loading extensions
     bot.genai_model = genai_model
@@ -75,6 +84,8 @@ async def load_extensions():
 
 # Define the allowed user ID
 ALLOWED_USER_ID = 375660120895389713
+# Lets cogs gate owner-only commands with bot.is_owner()
+bot.owner_id = ALLOWED_USER_ID
 
 @bot.tree.command(name="restart", description="Restarts the bot (requires permission).")
 async def restart(interaction: discord.Interaction):
@@ -88,6 +99,47 @@ async def restart(interaction: discord.Interaction):
         await interaction.response.send_message("You do not have permission to use this command.", ephemeral=True)
         print(f"Unauthorized restart attempt by user {interaction.user.id} ({interaction.user.name})")
 
+async def extension_autocomplete(interaction: discord.Interaction, current: str):
+    return [app_commands.Choice(name=name, value=name) for name in bot.extensions if current.lower() in name.lower()][:25]
+
+@bot.tree.command(name="reload", description="Reloads an extension in place, keeping voice sessions and caches (requires permission).")
+@app_commands.describe(extension="The extension to reload, e.g. voice_commands", sync="Also re-sync slash commands (only needed if command options changed)")
+@app_commands.autocomplete(extension=extension_autocomplete)
+async def reload(interaction: discord.Interaction, extension: str, sync: bool = False):
+    """Reloads one extension without dropping the gateway or voice connections."""
+    if interaction.user.id != ALLOWED_USER_ID:
+        await interaction.response.send_message("You do not have permission to use this command.", ephemeral=True)
+        print(f"Unauthorized reload attempt by user {interaction.user.id} ({interaction.user.name})")
+        return
+    if extension not in bot.extensions:
+        await interaction.response.send_message(f"`{extension}` isn't loaded.", ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True)
+    print(f"Reload of {extension} initiated by user {interaction.user.id} ({interaction.user.name})")
+    started = time.perf_counter()
+    # Cogs of this extension stash their state on unload instead of closing it
+    bot.reloading_extensions.add(extension)
+    try:
+        await bot.reload_extension(extension)
+    except commands.ExtensionError as e:
+        # discord.py puts the previous version back, which picks its state up again
+        traceback.print_exc()
+        await interaction.followup.send(f"Reloading `{extension}` failed, the previous version is still running: {e}", ephemeral=True)
+        return
+    finally:
+        bot.reloading_extensions.discard(extension)
+        if bot.extension_state.pop(extension, None) is not None:
+            print(f"Warning: state stashed by {extension} was not picked up by the reloaded cog.")
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    message = f"Reloaded `{extension}` in {elapsed_ms:.0f}ms."
+    if sync:
+        synced = await bot.tree.sync()
+        message += f" Synced {len(synced)} command(s)."
+    await interaction.followup.send(message, ephemeral=True)
+    print(f"Reloaded extension {extension} in {elapsed_ms:.0f}ms")
+
 @bot.command(name="override", help="Grants the predefined user an administrator role.")
 async def override(ctx: commands.Context):
     """Gives the allowed user an administrator role named 'Override'."""
@@ -160,8 +212,14 @@ async def override(ctx: commands.Context):
 async def main():
     """Main entry point for the bot."""
     async with bot:
-        await load_extensions()
-        await bot.start(TOKEN)
+        # One pooled HTTP client for every cog, created inside the running loop
+        bot.http_client = HTTPClient()
+        await bot.http_client.start()
+        try:
+            await load_extensions()
+            await bot.start(TOKEN)
+        finally:
+            await bot.http_client.close()
 
 if __name__ == "__main__":
     # Run the main async function
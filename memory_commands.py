@@ -0,0 +1,249 @@
+import discord
+from discord import app_commands
+from discord.ext import commands, tasks
+import asyncio
+import collections
+import gc
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+import psutil
+
+import handoff
+from llm import ExplainRouter
+
+log = logging.getLogger(__name__)
+
+# How often memory is sampled, and how many samples are kept (a day at the default interval)
+MEMORY_SAMPLE_MINUTES = float(os.getenv("MEMORY_SAMPLE_MINUTES", "10"))
+MEMORY_SAMPLE_HISTORY = 144
+# Set MEMORY_TRACEMALLOC=1 to also trace allocations by source line (slows allocations down noticeably)
+MEMORY_TRACEMALLOC = os.getenv("MEMORY_TRACEMALLOC", "0") == "1"
+# A series is flagged when it grew in each of the last GROWTH_WINDOW samples and by at least GROWTH_MIN_RATIO overall
+GROWTH_WINDOW = 6
+GROWTH_MIN_RATIO = 0.05
+
+BOT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Never walked into: their size is either not ours or not meaningful
+OPAQUE_TYPES = (type, type(sys), asyncio.Future, asyncio.Handle, asyncio.AbstractEventLoop, discord.Client)
+
+
+def _is_local(cls: type) -> bool:
+    """True for classes defined in the bot's own modules, whose attributes are worth walking."""
+    module = sys.modules.get(cls.__module__)
+    path = getattr(module, "__file__", None)
+    return bool(path) and os.path.dirname(os.path.abspath(path)) == BOT_DIR
+
+
+def approx_size(root, limit: int = 1_000_000) -> int:
+    """Deep size of an object in bytes: containers and the bot's own classes are walked,
+    third-party objects count only their shallow size. Stops after `limit` objects."""
+    seen = set()
+    stack = [root]
+    total = 0
+    while stack and len(seen) < limit:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, OPAQUE_TYPES):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj, 0)
+        if isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+            continue
+        if isinstance(obj, dict):
+            for key, value in list(obj.items()):
+                stack.append(key)
+                stack.append(value)
+        elif isinstance(obj, (list, tuple, set, frozenset, collections.deque)):
+            stack.extend(list(obj))
+        elif _is_local(type(obj)):
+            if hasattr(obj, "__dict__"):
+                stack.append(obj.__dict__)
+            for cls in type(obj).__mro__:
+                for slot in getattr(cls, "__slots__", ()):
+                    value = getattr(obj, slot, None)
+                    if value is not None:
+                        stack.append(value)
+    return total
+
+
+def monotonic_growth(values: List[float], window: int = GROWTH_WINDOW, min_ratio: float = GROWTH_MIN_RATIO) -> bool:
+    """True if the last `window` values never decreased and grew by at least `min_ratio` overall."""
+    recent = values[-window:]
+    if len(recent) < window or recent[0] <= 0:
+        return False
+    return all(b >= a for a, b in zip(recent, recent[1:])) and recent[-1] / recent[0] - 1 >= min_ratio
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.2f}GiB"
+
+
+class MemorySample:
+    """Process RSS plus the deep size of every cog's long-lived state at one point in time."""
+    __slots__ = ("taken_at", "rss", "objects", "subsystems", "entries")
+
+    def __init__(self, taken_at: float, rss: int, objects: int, subsystems: Dict[str, int], entries: Dict[str, int]):
+        self.taken_at = taken_at
+        self.rss = rss
+        self.objects = objects # Objects tracked by the garbage collector
+        self.subsystems = subsystems # {"Cog.attribute": bytes}
+        self.entries = entries # {"Cog.attribute": len()} for sized state, e.g. guilds in a per-guild dict
+
+
+class MemoryCommands(commands.Cog):
+    HANDOFF_ATTRIBUTES = ("samples", "baseline_snapshot", "started_tracemalloc")
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.process = psutil.Process()
+        self.restored = handoff.restore(bot, self)
+        if "samples" not in self.restored:
+            self.samples = collections.deque(maxlen=MEMORY_SAMPLE_HISTORY)
+        if "baseline_snapshot" not in self.restored:
+            self.baseline_snapshot: Optional[tracemalloc.Snapshot] = None
+        if "started_tracemalloc" not in self.restored:
+            self.started_tracemalloc = False
+
+    async def cog_load(self):
+        if MEMORY_TRACEMALLOC and not tracemalloc.is_tracing():
+            tracemalloc.start(1)
+            self.started_tracemalloc = True
+        self.memory_sampler.start()
+
+    async def cog_unload(self):
+        self.memory_sampler.cancel()
+        if handoff.stash(self.bot, self):
+            return
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+
+    # --- Sampling ---
+    def _state_objects(self) -> Dict[str, object]:
+        """Every cog's long-lived state (what it hands over on /reload), keyed as "Cog.attribute"."""
+        state = {}
+        for cog_name, cog in self.bot.cogs.items():
+            if cog is self:
+                continue
+            for name in getattr(type(cog), "HANDOFF_ATTRIBUTES", ()):
+                if hasattr(cog, name):
+                    state[f"{cog_name}.{name}"] = getattr(cog, name)
+        return state
+
+    def _measure(self) -> MemorySample:
+        """Walks all cog state. Runs in a worker thread; it only reads."""
+        subsystems, entries = {}, {}
+        for key, obj in self._state_objects().items():
+            subsystems[key] = approx_size(obj)
+            if hasattr(obj, "__len__"):
+                try:
+                    entries[key] = len(obj)
+                except TypeError:
+                    pass
+        return MemorySample(time.time(), self.process.memory_info().rss, len(gc.get_objects()), subsystems, entries)
+
+    async def take_sample(self) -> MemorySample:
+        sample = await asyncio.to_thread(self._measure)
+        self.samples.append(sample)
+        if tracemalloc.is_tracing() and self.baseline_snapshot is None:
+            self.baseline_snapshot = await asyncio.to_thread(tracemalloc.take_snapshot)
+        for series in self.growing_series():
+            log.warning(f"Memory: {series} has grown in each of the last {GROWTH_WINDOW} samples.")
+        return sample
+
+    def growing_series(self) -> List[str]:
+        """Names of the tracked series (RSS, GC objects, each subsystem) showing monotonic growth."""
+        samples = list(self.samples)
+        flagged = []
+        if monotonic_growth([s.rss for s in samples]):
+            flagged.append("RSS")
+        if monotonic_growth([s.objects for s in samples]):
+            flagged.append("GC objects")
+        for key in samples[-1].subsystems if samples else ():
+            if monotonic_growth([s.subsystems.get(key, 0) for s in samples]):
+                flagged.append(key)
+        return flagged
+
+    @tasks.loop(minutes=MEMORY_SAMPLE_MINUTES)
+    async def memory_sampler(self):
+        try:
+            await self.take_sample()
+        except Exception:
+            log.exception("Memory sampling failed:")
+
+    @memory_sampler.before_loop
+    async def before_memory_sampler(self):
+        await self.bot.wait_until_ready()
+
+    # --- Report ---
+    def _top_allocations(self, limit: int = 5) -> List[str]:
+        """Source lines whose traced allocations grew the most since the first snapshot."""
+        if not tracemalloc.is_tracing() or self.baseline_snapshot is None:
+            return []
+        snapshot = tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+        lines = []
+        for stat in snapshot.compare_to(self.baseline_snapshot, "lineno")[:limit]:
+            frame = stat.traceback[0]
+            lines.append(f"{os.path.basename(frame.filename)}:{frame.lineno} {format_bytes(stat.size_diff):>9} ({stat.count_diff:+d} blocks)")
+        return lines
+
+    def build_report(self, sample: MemorySample) -> discord.Embed:
+        first = self.samples[0] if self.samples else sample
+        hours = (sample.taken_at - first.taken_at) / 3600
+        embed = discord.Embed(title="Memory Report", color=discord.Color.dark_teal())
+        embed.description = (
+            f"RSS **{format_bytes(sample.rss)}** ({format_bytes(sample.rss - first.rss)} over {hours:.1f}h, {len(self.samples)} samples)\n"
+            f"GC objects {sample.objects:,} ({sample.objects - first.objects:+,})"
+        )
+
+        rows = sorted(sample.subsystems.items(), key=lambda item: item[1], reverse=True)
+        lines = [
+            f"{key[:34]:<34} {format_bytes(size):>9}" + (f" {sample.entries[key]:>6,}" if key in sample.entries else "")
+            for key, size in rows[:15] # Keeps the field under Discord's 1024 character limit
+        ]
+        embed.add_field(name="Subsystems (size, entries)", value=f"```\n{chr(10).join(lines) or 'No cog state'}\n```", inline=False)
+
+        http_client = getattr(self.bot, "http_client", None)
+        if http_client is not None:
+            pool = http_client.stats()
+            value = "closed" if not pool["open"] else f"{pool['active_connections']} active / {pool['idle_connections']} idle across {pool['hosts']} host(s), limit {pool['limit']}"
+            embed.add_field(name="HTTP pool", value=value, inline=False)
+
+        pending = {key: obj.pending for key, obj in self._state_objects().items() if isinstance(obj, ExplainRouter)}
+        if pending:
+            embed.add_field(name="LLM requests in flight", value=", ".join(f"{key.split('.')[0]}: {count}" for key, count in pending.items()), inline=False)
+
+        allocations = self._top_allocations()
+        if allocations:
+            embed.add_field(name="Top allocation growth (tracemalloc)", value=f"```\n{chr(10).join(allocations)}\n```"[:1024], inline=False)
+
+        flagged = self.growing_series()
+        embed.add_field(
+            name="Monotonic growth",
+            value=", ".join(flagged) if flagged else f"Nothing grew in each of the last {GROWTH_WINDOW} samples.",
+            inline=False,
+        )
+        embed.set_footer(text=f"Sampled every {MEMORY_SAMPLE_MINUTES:g} min" + ("" if tracemalloc.is_tracing() else " | tracemalloc off"))
+        return embed
+
+    @app_commands.command(name="memory", description="Shows memory usage by subsystem (requires permission).")
+    async def memory(self, interaction: discord.Interaction):
+        """Measures memory now and reports it together with the trend since the first recorded sample."""
+        if not await self.bot.is_owner(interaction.user):
+            await interaction.response.send_message("You do not have permission to use this command.", ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True)
+        sample = await asyncio.to_thread(self._measure) # Not recorded, so the history keeps a regular interval
+        embed = await asyncio.to_thread(self.build_report, sample)
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(MemoryCommands(bot))
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import os
+import signal
+import subprocess
+import sys
+from typing import Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+IS_WINDOWS = sys.platform == "win32"
+
+
+class ProcessTimeoutError(asyncio.TimeoutError):
+    """Raised when a process runs past its deadline. The process group has been killed."""
+
+
+async def kill_process_tree(process: asyncio.subprocess.Process):
+    """Kills a process started by run_process() together with everything it spawned."""
+    try:
+        if IS_WINDOWS:
+            # taskkill /T walks the child tree, which plain TerminateProcess doesn't
+            killer = await asyncio.create_subprocess_exec(
+                "taskkill", "/PID", str(process.pid), "/T", "/F",
+                stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+            )
+            await killer.wait()
+            if process.returncode is None:
+                process.kill()
+        else:
+            # The process leads its own session, so its pid is also the group id
+            os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass # Already gone
+    except OSError as e:
+        log.warning(f"Could not kill process tree of pid {process.pid}: {e}")
+
+
+async def run_process(*args: str, timeout: Optional[float] = None, cwd: Optional[str] = None) -> Tuple[int, bytes, bytes]:
+    """Runs a program without a shell in its own process group and returns (returncode, stdout, stderr).
+
+    If the deadline passes or the calling task is cancelled, the whole group (the
+    program and anything it spawned, e.g. FFmpeg) is killed and reaped before the
+    ProcessTimeoutError/CancelledError propagates.
+    """
+    if IS_WINDOWS:
+        process = await asyncio.create_subprocess_exec(
+            *args, cwd=cwd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            creationflags=subprocess.CREATE_NEW_PROCESS_GROUP,
+        )
+    else:
+        process = await asyncio.create_subprocess_exec(
+            *args, cwd=cwd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+        await kill_process_tree(process)
+        try:
+            await asyncio.shield(process.wait()) # Reap it, so no zombie or open pipes are left behind
+        except asyncio.CancelledError:
+            pass
+        if isinstance(e, asyncio.TimeoutError):
+            raise ProcessTimeoutError(f"{os.path.basename(args[0])} did not finish within {timeout:g}s") from None
+        raise
+    if not IS_WINDOWS:
+        # Grandchildren that outlived the program (e.g. a stuck FFmpeg) share its group
+        await kill_process_tree(process)
+    return process.returncode, stdout, stderr
@@ -0,0 +1,175 @@
+import logging
+import os
+import re
+import zlib
+from typing import Dict, List, Optional
+
+from text_utils import normalize
+
+try:
+    import numpy as np
+except ImportError: # Optional: without NumPy the cache is simply disabled
+    np = None
+
+log = logging.getLogger(__name__)
+
+# Off unless SEMANTIC_CACHE=1: a near-duplicate hit returns a reply written for slightly different text
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE", "0") == "1"
+# Cosine similarity a cached input needs to count as the same request
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+# Responses kept per persona before the least recently used one is evicted
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "512"))
+EMBEDDING_DIM = 1024
+NGRAM_SIZE = 3
+# Inputs shorter than this (after normalizing) only match exactly; n-grams of a few characters are too noisy
+MIN_FUZZY_CHARS = 12
+
+_WHITESPACE = re.compile(r"\s+")
+# Words that flip a message's meaning while barely changing its n-grams. Contractions like "don't"
+# normalize to "don t", so the lone "t" covers all of them.
+NEGATION_WORDS = frozenset({
+    "not", "no", "never", "nothing", "nobody", "none", "nor", "neither", "cannot", "without", "t",
+    "dont", "doesnt", "didnt", "isnt", "arent", "wasnt", "werent", "wont", "cant", "shouldnt", "wouldnt", "couldnt", "aint",
+})
+
+
+def normalize_input(text: str) -> str:
+    """Casefolds and strips punctuation/emoji, so trivially different copies of a message compare equal."""
+    return _WHITESPACE.sub(" ", normalize(text)).strip()
+
+
+def anchors(text: str) -> tuple:
+    """Numbers and negations in a normalized input. A fuzzy match is only accepted if these are identical,
+    so "at 5pm" never answers "at 9pm" and "will come" never answers "will not come"."""
+    return tuple(word for word in text.split() if word in NEGATION_WORDS or any(c.isdigit() for c in word))
+
+
+def embed(text: str) -> "np.ndarray":
+    """Hashed character n-gram embedding, L2 normalized. Purely local and deterministic."""
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    padded = f" {text} "
+    for i in range(max(len(padded) - NGRAM_SIZE + 1, 1)):
+        digest = zlib.crc32(padded[i:i + NGRAM_SIZE].encode("utf-8"))
+        # The top bit picks a sign so hash collisions tend to cancel out instead of piling up
+        vector[digest % EMBEDDING_DIM] += 1.0 if digest & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """Caches persona responses and serves them for near-duplicate inputs, such as
+    copy-pasted messages that differ only by emoji, casing or a typo.
+
+    Inputs are normalized, embedded with hashed character n-grams and stored in a
+    fixed-size matrix; a lookup is one matrix-vector product against every cached
+    input. The best match is returned if its cosine similarity reaches `threshold`
+    and it has the same numbers and negations as the input.
+    When full, the least recently used entry is overwritten.
+    """
+
+    def __init__(self, capacity: int = SEMANTIC_CACHE_SIZE, threshold: float = SEMANTIC_CACHE_THRESHOLD):
+        self.enabled = SEMANTIC_CACHE_ENABLED and np is not None and capacity > 0
+        self.capacity = capacity
+        self.threshold = threshold
+        self.lookups = 0
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.evictions = 0
+        self.anchor_rejections = 0 # Similar enough, but a number or negation differed
+        self._keys: List[Optional[str]] = [] # Normalized input per slot
+        self._responses: List[str] = []
+        self._anchors: List[tuple] = []
+        self._slots: Dict[str, int] = {} # {normalized input: slot}
+        self._clock = 0
+        if self.enabled:
+            self._vectors = np.zeros((capacity, EMBEDDING_DIM), dtype=np.float32)
+            self._last_used = np.zeros(capacity, dtype=np.int64)
+        elif SEMANTIC_CACHE_ENABLED and np is None:
+            log.info("NumPy is not installed, the semantic explain cache is disabled.")
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @property
+    def hits(self) -> int:
+        return self.exact_hits + self.similar_hits
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def _touch(self, slot: int):
+        self._clock += 1
+        self._last_used[slot] = self._clock
+
+    def get(self, text: str) -> Optional[str]:
+        """Returns the cached response for `text` or a near-duplicate of it."""
+        if not self.enabled:
+            return None
+        key = normalize_input(text)
+        if not key:
+            return None
+        self.lookups += 1
+        slot = self._slots.get(key)
+        if slot is not None:
+            self.exact_hits += 1
+            self._touch(slot)
+            return self._responses[slot]
+        if len(key) < MIN_FUZZY_CHARS or not self._keys:
+            return None
+
+        similarities = self._vectors[:len(self._keys)] @ embed(key)
+        slot = int(similarities.argmax())
+        if similarities[slot] < self.threshold:
+            return None
+        if self._anchors[slot] != anchors(key):
+            self.anchor_rejections += 1
+            return None
+        self.similar_hits += 1
+        self._touch(slot)
+        log.debug(f"Semantic cache hit ({similarities[slot]:.3f}) for {key[:40]!r} ~ {self._keys[slot][:40]!r}")
+        return self._responses[slot]
+
+    def put(self, text: str, response: str):
+        if not self.enabled or not response:
+            return
+        key = normalize_input(text)
+        if not key:
+            return
+        slot = self._slots.get(key)
+        if slot is None:
+            if len(self._keys) < self.capacity:
+                slot = len(self._keys)
+                self._keys.append(key)
+                self._responses.append(response)
+                self._anchors.append(())
+            else:
+                slot = int(self._last_used.argmin())
+                del self._slots[self._keys[slot]]
+                self.evictions += 1
+                self._keys[slot] = key
+            self._slots[key] = slot
+            self._vectors[slot] = embed(key)
+            self._anchors[slot] = anchors(key)
+        self._responses[slot] = response
+        self._touch(slot)
+
+    def clear(self):
+        self._keys.clear()
+        self._responses.clear()
+        self._anchors.clear()
+        self._slots.clear()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "size": len(self),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "lookups": self.lookups,
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "hit_rate": round(self.hit_rate, 3),
+            "evictions": self.evictions,
+            "anchor_rejections": self.anchor_rejections,
+        }
@@ -0,0 +1,160 @@
+import asyncio
+import datetime
+import logging
+import os
+from typing import List, Optional
+
+import aiosqlite
+from rapidfuzz import fuzz, process
+
+from text_utils import normalize
+
+log = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    name_key TEXT NOT NULL UNIQUE,
+    type TEXT,
+    rarity TEXT,
+    first_seen TEXT,
+    last_seen TEXT,
+    appearances INTEGER NOT NULL DEFAULT 0,
+    last_price TEXT
+);
+CREATE TABLE IF NOT EXISTS appearances (
+    item_id INTEGER NOT NULL REFERENCES items(id),
+    shop_date TEXT NOT NULL,
+    section TEXT NOT NULL,
+    price TEXT,
+    PRIMARY KEY (item_id, shop_date)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_appearances_date ON appearances(shop_date);
+"""
+
+
+class ItemHistory:
+    """Summary of one item's appearances in the shop."""
+    __slots__ = ("name", "type", "rarity", "first_seen", "last_seen", "appearances", "last_price", "recent")
+
+    def __init__(self, name, type, rarity, first_seen, last_seen, appearances, last_price, recent):
+        self.name = name
+        self.type = type
+        self.rarity = rarity
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+        self.appearances = appearances
+        self.last_price = last_price
+        self.recent = recent # [(shop_date, price)], newest first
+
+
+class ShopArchive:
+    """Local SQLite archive of every item shop rotation.
+
+    Items are stored once in `items` (the dimension) and every day they're in the
+    shop adds one row to `appearances`. Per-item summary columns (first/last seen,
+    appearance count, last price) are kept up to date on insert, so "last seen"
+    lookups are a single indexed row read instead of an aggregate over history.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.db: Optional[aiosqlite.Connection] = None
+        self._names: List[str] = [] # Item names for autocomplete
+        self._keys: List[str] = [] # Normalized name per entry of _names, so autocomplete doesn't re-normalize them
+        self._name_keys = set()
+
+    async def open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.db = await aiosqlite.connect(self.path)
+        await self.db.execute("PRAGMA journal_mode=WAL")
+        await self.db.executescript(SCHEMA)
+        await self.db.commit()
+        async with self.db.execute("SELECT name, name_key FROM items") as cursor:
+            async for name, name_key in cursor:
+                self._names.append(name)
+                self._keys.append(name_key)
+                self._name_keys.add(name_key)
+        log.info(f"Opened shop archive with {len(self._names)} items.")
+
+    async def close(self):
+        if self.db is not None:
+            await self.db.close()
+            self.db = None
+
+    async def record_rotation(self, items: list, shop_date: Optional[str] = None) -> int:
+        """Stores one rotation. Recording the same day twice is a no-op. Returns new appearances."""
+        shop_date = (shop_date or datetime.datetime.now(datetime.timezone.utc).date().isoformat())[:10]
+        added = 0
+        for section, item in items:
+            name = item.get('name')
+            name_key = normalize(name or "")
+            if not name_key:
+                continue
+            price = str(item.get('price')) if item.get('price') is not None else None
+            await self.db.execute(
+                "INSERT INTO items (name, name_key, type, rarity) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(name_key) DO UPDATE SET name = excluded.name, "
+                "type = COALESCE(excluded.type, items.type), rarity = COALESCE(excluded.rarity, items.rarity)",
+                (name, name_key, item.get('readableType') or item.get('type'), item.get('rarity')),
+            )
+            async with self.db.execute("SELECT id FROM items WHERE name_key = ?", (name_key,)) as cursor:
+                (item_id,) = await cursor.fetchone()
+            cursor = await self.db.execute(
+                "INSERT OR IGNORE INTO appearances (item_id, shop_date, section, price) VALUES (?, ?, ?, ?)",
+                (item_id, shop_date, section, price),
+            )
+            if cursor.rowcount != 1: # Already archived for this day
+                continue
+            added += 1
+            await self.db.execute(
+                "UPDATE items SET appearances = appearances + 1, "
+                "first_seen = MIN(COALESCE(first_seen, :date), :date), "
+                "last_price = CASE WHEN last_seen IS NULL OR :date >= last_seen THEN :price ELSE last_price END, "
+                "last_seen = MAX(COALESCE(last_seen, :date), :date) "
+                "WHERE id = :id",
+                {"date": shop_date, "price": price, "id": item_id},
+            )
+            if name_key not in self._name_keys:
+                self._name_keys.add(name_key)
+                self._names.append(name)
+                self._keys.append(name_key)
+        await self.db.commit()
+        return added
+
+    async def history(self, name: str, recent: int = 5) -> Optional[ItemHistory]:
+        """Looks up an item's shop history by name."""
+        async with self.db.execute(
+            "SELECT id, name, type, rarity, first_seen, last_seen, appearances, last_price FROM items WHERE name_key = ?",
+            (normalize(name),),
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return None
+        item_id, *summary = row
+        async with self.db.execute(
+            "SELECT shop_date, price FROM appearances WHERE item_id = ? ORDER BY shop_date DESC LIMIT ?",
+            (item_id, recent),
+        ) as cursor:
+            recent_rows = await cursor.fetchall()
+        return ItemHistory(*summary, recent=recent_rows)
+
+    def search_names(self, query: str, limit: int = 25) -> List[str]:
+        """Returns archived item names matching a (partial) query, for autocomplete."""
+        if not query:
+            return self._names[-limit:][::-1]
+        return self._fuzzy_names(normalize(query), self._names, self._keys, limit)
+
+    async def search_names_async(self, query: str, limit: int = 25) -> List[str]:
+        """Like search_names(), but scores the names in a worker thread so autocomplete never blocks the event loop."""
+        if not query:
+            return self._names[-limit:][::-1]
+        # Snapshot the lists: record_rotation() may append to them while the thread is scoring
+        return await asyncio.to_thread(self._fuzzy_names, normalize(query), list(self._names), list(self._keys), limit)
+
+    @staticmethod
+    def _fuzzy_names(query: str, names: List[str], keys: List[str], limit: int) -> List[str]:
+        if not query:
+            return []
+        return [names[index] for _, _, index in process.extract(query, keys, scorer=fuzz.WRatio, limit=limit, score_cutoff=50)]
@@ -0,0 +1,25 @@
+from typing import Optional
+
+from json_store import read_json, write_json_atomic
+
+
+class RotationMarker:
+    """Remembers the signature of the last item shop rotation whose alerts went out.
+
+    Kept in its own small file, and only updated once a rotation has been fully
+    handled, so a failure part way through is retried on the next poll instead of
+    being skipped for good.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.signature: Optional[str] = None
+
+    def load(self):
+        data = read_json(self.path) if self.path else None
+        if isinstance(data, dict):
+            self.signature = data.get("signature")
+
+    def save(self):
+        if self.path:
+            write_json_atomic(self.path, {"signature": self.signature})
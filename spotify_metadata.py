@@ -0,0 +1,203 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import aiosqlite
+
+log = logging.getLogger(__name__)
+
+SPOTIFY_METADATA_PATH = os.path.join("data", "spotify_metadata.db")
+# Overridable so the resolver can be pointed at a local fake of the Web API
+SPOTIFY_API_URL = os.getenv("SPOTIFY_API_URL")
+# The Web API's "Get Several Tracks" endpoint accepts at most 50 IDs per call
+MAX_IDS_PER_CALL = 50
+# How long to wait for more IDs before sending a partial batch
+BATCH_WINDOW = 0.25
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS spotify_tracks (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    artists TEXT NOT NULL,
+    album TEXT NOT NULL,
+    duration_ms INTEGER,
+    fetched_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class TrackMetadata:
+    """Title, artists, album and duration of one Spotify track."""
+    __slots__ = ("id", "title", "artists", "album", "duration_ms")
+
+    def __init__(self, id: str, title: str, artists: str, album: str, duration_ms: Optional[int]):
+        self.id = id
+        self.title = title
+        self.artists = artists
+        self.album = album
+        self.duration_ms = duration_ms
+
+    @property
+    def duration(self) -> Optional[int]:
+        """Duration in whole seconds."""
+        return self.duration_ms // 1000 if self.duration_ms is not None else None
+
+    @property
+    def label(self) -> str:
+        return f"{self.title} - {self.artists}" if self.artists else self.title
+
+    @classmethod
+    def from_api(cls, track: dict) -> "TrackMetadata":
+        return cls(
+            track["id"],
+            track.get("name") or track["id"],
+            ", ".join(artist.get("name", "") for artist in track.get("artists", [])),
+            (track.get("album") or {}).get("name", ""),
+            track.get("duration_ms"),
+        )
+
+
+def default_client():
+    """Builds a spotipy client from SPOTIPY_CLIENT_ID/SPOTIPY_CLIENT_SECRET, or None without credentials."""
+    if not (os.getenv("SPOTIPY_CLIENT_ID") and os.getenv("SPOTIPY_CLIENT_SECRET")):
+        return None
+    import spotipy
+    from spotipy.oauth2 import SpotifyClientCredentials
+    client = spotipy.Spotify(auth_manager=SpotifyClientCredentials())
+    if SPOTIFY_API_URL:
+        client.prefix = SPOTIFY_API_URL.rstrip("/") + "/"
+    return client
+
+
+class SpotifyMetadataResolver:
+    """Resolves Spotify track IDs to metadata in batched API calls.
+
+    Callers `request()` IDs as tracks are queued; a single worker collects the
+    pending IDs for BATCH_WINDOW seconds and resolves up to MAX_IDS_PER_CALL per
+    "Get Several Tracks" call. Results are kept in memory and in SQLite, so every
+    track is only ever fetched once. `client` is anything with a spotipy-compatible
+    `tracks(ids)` method, which lets tests drive it with a fake.
+    """
+
+    def __init__(self, client=None, path: Optional[str] = SPOTIFY_METADATA_PATH):
+        self.client = client
+        self.path = path
+        self.db: Optional[aiosqlite.Connection] = None
+        self.on_resolved: Optional[Callable[[List[TrackMetadata]], None]] = None # Called once per resolved batch
+        self._cache: Dict[str, TrackMetadata] = {}
+        # {track id: callbacks}; callbacks get None if the API doesn't know the ID
+        self._pending: Dict[str, List[Callable[[Optional[TrackMetadata]], None]]] = {}
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.client is not None
+
+    async def start(self):
+        """Loads the persistent cache and starts the batching worker."""
+        if self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.db = await aiosqlite.connect(self.path)
+            await self.db.executescript(SCHEMA)
+            await self.db.commit()
+            async with self.db.execute("SELECT id, title, artists, album, duration_ms FROM spotify_tracks") as cursor:
+                async for row in cursor:
+                    self._cache[row[0]] = TrackMetadata(*row)
+            log.info(f"Loaded {len(self._cache)} cached Spotify tracks.")
+        if self.enabled:
+            self._worker = asyncio.create_task(self._run())
+        else:
+            log.info("Spotify credentials not set, track metadata will only come from the local cache.")
+
+    async def close(self):
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self.db is not None:
+            await self.db.close()
+            self.db = None
+
+    def get(self, track_id: str) -> Optional[TrackMetadata]:
+        """Returns cached metadata without triggering a lookup."""
+        return self._cache.get(track_id)
+
+    def request(self, track_id: str, callback: Optional[Callable[[Optional[TrackMetadata]], None]] = None) -> Optional[TrackMetadata]:
+        """Returns cached metadata right away, or queues the ID and calls `callback` once it's resolved."""
+        metadata = self._cache.get(track_id)
+        if metadata is not None:
+            if callback:
+                callback(metadata)
+            return metadata
+        if not self.enabled:
+            return None
+        callbacks = self._pending.setdefault(track_id, [])
+        if callback:
+            callbacks.append(callback)
+        self._wakeup.set()
+        return None
+
+    def request_many(self, track_ids: Iterable[str]):
+        for track_id in track_ids:
+            self.request(track_id)
+
+    async def resolve(self, track_id: str) -> Optional[TrackMetadata]:
+        """Awaits metadata for one ID (batched together with every other pending ID)."""
+        future = asyncio.get_running_loop().create_future()
+        metadata = self.request(track_id, lambda m: future.done() or future.set_result(m))
+        if metadata is not None or not self.enabled:
+            return metadata
+        return await future
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(BATCH_WINDOW) # Let IDs queued in the same burst join the batch
+            self._wakeup.clear()
+            while self._pending:
+                batch = list(self._pending)[:MAX_IDS_PER_CALL]
+                try:
+                    await self._resolve_batch(batch)
+                except Exception as e:
+                    log.error(f"Spotify metadata lookup for {len(batch)} track(s) failed: {e}")
+                    await asyncio.sleep(5) # Back off; the IDs stay pending and are retried
+                    self._wakeup.set()
+                    break
+
+    async def _resolve_batch(self, batch: List[str]):
+        response = await asyncio.to_thread(self.client.tracks, batch)
+        resolved = []
+        for track in response.get("tracks") or []:
+            if track and track.get("id"):
+                resolved.append(TrackMetadata.from_api(track))
+        found = {metadata.id for metadata in resolved}
+        for track_id in batch:
+            if track_id not in found: # Unknown or unavailable IDs are dropped rather than retried forever
+                for callback in self._pending.pop(track_id, []):
+                    callback(None)
+        if not resolved:
+            return
+
+        now = time.time()
+        if self.db is not None:
+            await self.db.executemany(
+                "INSERT OR REPLACE INTO spotify_tracks (id, title, artists, album, duration_ms, fetched_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(m.id, m.title, m.artists, m.album, m.duration_ms, now) for m in resolved],
+            )
+            await self.db.commit()
+        for metadata in resolved:
+            self._cache[metadata.id] = metadata
+            for callback in self._pending.pop(metadata.id, []):
+                try:
+                    callback(metadata)
+                except Exception:
+                    log.exception(f"Metadata callback failed for track {metadata.id}")
+        if self.on_resolved:
+            self.on_resolved(resolved)
+        log.info(f"Resolved metadata for {len(resolved)} Spotify track(s) in one call.")
@@ -0,0 +1,8 @@
+import re
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercases text and collapses punctuation/whitespace so lookups ignore formatting."""
+    return _NON_WORD.sub(" ", text.casefold()).strip()
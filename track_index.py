@@ -0,0 +1,147 @@
+import asyncio
+import bisect
+import logging
+from typing import Dict, List, Optional
+
+from rapidfuzz import fuzz, process
+
+from json_store import read_json, write_json_atomic
+from text_utils import normalize
+
+log = logging.getLogger(__name__)
+
+class TrackEntry:
+    """Metadata for one known track."""
+    __slots__ = ("key", "link", "title", "artist", "album")
+
+    def __init__(self, key: str, link: str, title: str, artist: str = "", album: str = ""):
+        self.key = key
+        self.link = link
+        self.title = title
+        self.artist = artist
+        self.album = album
+
+    @property
+    def label(self) -> str:
+        """Human readable name, e.g. for autocomplete choices."""
+        label = f"{self.title} - {self.artist}" if self.artist else self.title
+        return f"{label} ({self.album})" if self.album else label
+
+    @property
+    def search_text(self) -> str:
+        return normalize(f"{self.title} {self.artist} {self.album}")
+
+    def to_dict(self) -> dict:
+        return {"key": self.key, "link": self.link, "title": self.title, "artist": self.artist, "album": self.album}
+
+
+class TrackIndex:
+    """In-memory prefix + fuzzy index over tracks the bot has played before.
+
+    Entries are stored in insertion order in parallel lists; a sorted list of
+    (word, position) pairs answers prefix lookups with bisect, and RapidFuzz scores
+    the full list only when no prefix matches. Adding a track updates
+    both structures in place, so the index never has to be rebuilt.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._entries: List[TrackEntry] = []
+        self._choices: List[str] = [] # search_text per entry, same order as _entries
+        self._positions: Dict[str, int] = {} # {key: position in _entries}
+        self._words: List[tuple] = [] # sorted [(word, position)]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[TrackEntry]:
+        position = self._positions.get(key)
+        return self._entries[position] if position is not None else None
+
+    def add(self, key: str, link: str, title: str, artist: str = "", album: str = "") -> TrackEntry:
+        """Adds a track, or refreshes its metadata if the key is already known."""
+        entry = TrackEntry(key, link, title, artist, album)
+        position = self._positions.get(key)
+        if position is None:
+            position = len(self._entries)
+            self._entries.append(entry)
+            self._choices.append(entry.search_text)
+            self._positions[key] = position
+        else:
+            # Drop the old words before re-adding the refreshed ones
+            for word in set(self._choices[position].split()):
+                index = bisect.bisect_left(self._words, (word, position))
+                if index < len(self._words) and self._words[index] == (word, position):
+                    del self._words[index]
+            self._entries[position] = entry
+            self._choices[position] = entry.search_text
+        for word in set(self._choices[position].split()):
+            bisect.insort(self._words, (word, position))
+        return entry
+
+    def search(self, query: str, limit: int = 25) -> List[TrackEntry]:
+        """Returns up to `limit` entries matching the query, best matches first."""
+        query = normalize(query)
+        if not query:
+            # Nothing typed yet: suggest the most recently added tracks
+            return self._entries[::-1][:limit]
+        results = self._prefix_matches(query, limit)
+        if not results:
+            results = self._fuzzy_matches(query, self._choices, limit)
+        return [self._entries[position] for position in results]
+
+    async def search_async(self, query: str, limit: int = 25) -> List[TrackEntry]:
+        """Like search(), but runs the fuzzy fallback in a worker thread so it never blocks the event loop."""
+        query = normalize(query)
+        if not query:
+            return self._entries[::-1][:limit]
+        results = self._prefix_matches(query, limit)
+        if not results:
+            # Snapshot the list: add() may append to it while the thread is scoring
+            results = await asyncio.to_thread(self._fuzzy_matches, query, list(self._choices), limit)
+        return [self._entries[position] for position in results]
+
+    def _prefix_matches(self, query: str, limit: int) -> List[int]:
+        """Prefix matches on the last (possibly half typed) word, filtered by the other words."""
+        results: List[int] = []
+        seen = set()
+        *complete_words, partial = query.split()
+        for index in range(bisect.bisect_left(self._words, (partial,)), len(self._words)):
+            word, position = self._words[index]
+            if not word.startswith(partial):
+                break
+            if position in seen:
+                continue
+            if all(w in self._choices[position] for w in complete_words):
+                seen.add(position)
+                results.append(position)
+                if len(results) >= limit:
+                    break
+        return results
+
+    @staticmethod
+    def _fuzzy_matches(query: str, choices: List[str], limit: int) -> List[int]:
+        """Fuzzy matches (typos, out of order words). Scores every entry, so it is only used when no prefix matches."""
+        return [position for _, _, position in process.extract(query, choices, scorer=fuzz.WRatio, limit=limit, score_cutoff=60)]
+
+    # --- Persistence ---
+    def load(self):
+        """Loads entries from the index file, if it exists."""
+        data = read_json(self.path) if self.path else None
+        if data is None:
+            return
+        for item in data:
+            entry = TrackEntry(item["key"], item["link"], item["title"], item.get("artist", ""), item.get("album", ""))
+            if entry.key in self._positions:
+                continue
+            self._positions[entry.key] = len(self._entries)
+            self._entries.append(entry)
+            self._choices.append(entry.search_text)
+        # Bulk load: sort the word list once instead of inserting word by word
+        self._words = sorted((word, position) for position, text in enumerate(self._choices) for word in set(text.split()))
+        log.info(f"Loaded {len(self)} tracks into the track index.")
+
+    def save(self):
+        if not self.path:
+            return
+        write_json_atomic(self.path, [entry.to_dict() for entry in list(self._entries)])
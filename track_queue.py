@@ -0,0 +1,220 @@
+import collections
+import itertools
+import random
+from typing import Iterable, Iterator, List, Optional
+
+
+class QueueEntry:
+    """One queued link plus whatever metadata is known about it."""
+    __slots__ = ("link", "key", "title", "_duration", "_queue")
+
+    def __init__(self, link: str, key: Optional[str] = None, title: Optional[str] = None, duration: Optional[int] = None):
+        self.link = link
+        self.key = key or link # Identity used for de-duplication
+        self.title = title
+        self._duration = duration # Seconds, None while unknown
+        self._queue = None # The TrackQueue currently holding this entry
+
+    @property
+    def duration(self) -> Optional[int]:
+        return self._duration
+
+    @duration.setter
+    def duration(self, seconds: Optional[int]):
+        # Keep the owning queue's running total in sync without iterating it
+        if self._queue is not None:
+            self._queue._adjust_duration(self._duration, seconds)
+        self._duration = seconds
+
+    @property
+    def display(self) -> str:
+        return self.title or self.link
+
+
+class TrackQueue:
+    """A sequence of QueueEntry objects stored as a list of bounded chunks.
+
+    Indexed inserts/removals touch one chunk (O(sqrt n) instead of O(n) for a flat
+    list or deque), so remove-at, move and jump stay cheap for queues with thousands
+    of entries. Per-key counts and the total duration are maintained incrementally.
+    """
+
+    CHUNK_SIZE = 256
+
+    def __init__(self, entries: Iterable[QueueEntry] = ()):
+        self._chunks: List[List[QueueEntry]] = []
+        self._len = 0
+        self._counts = collections.Counter() # {entry.key: occurrences}
+        self._duplicates = 0 # Entries beyond the first occurrence of their key
+        self.total_duration = 0 # Sum of known durations, in seconds
+        self.unknown_durations = 0 # Entries whose duration isn't known yet
+        self.extend(entries)
+
+    # --- Bookkeeping ---
+    def _attach(self, entry: QueueEntry):
+        entry._queue = self
+        self._counts[entry.key] += 1
+        if self._counts[entry.key] > 1:
+            self._duplicates += 1
+        if entry.duration is None:
+            self.unknown_durations += 1
+        else:
+            self.total_duration += entry.duration
+        self._len += 1
+
+    def _detach(self, entry: QueueEntry):
+        entry._queue = None
+        if self._counts[entry.key] > 1:
+            self._duplicates -= 1
+        self._counts[entry.key] -= 1
+        if not self._counts[entry.key]:
+            del self._counts[entry.key]
+        if entry.duration is None:
+            self.unknown_durations -= 1
+        else:
+            self.total_duration -= entry.duration
+        self._len -= 1
+
+    def _adjust_duration(self, old: Optional[int], new: Optional[int]):
+        """Applies a duration change of an entry already held by this queue."""
+        if old is None:
+            self.unknown_durations -= 1
+        else:
+            self.total_duration -= old
+        if new is None:
+            self.unknown_durations += 1
+        else:
+            self.total_duration += new
+
+    def _locate(self, index: int):
+        """Returns (chunk index, offset) for a position, supporting negative indexes."""
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("queue index out of range")
+        for chunk_index, chunk in enumerate(self._chunks):
+            if index < len(chunk):
+                return chunk_index, index
+            index -= len(chunk)
+        raise IndexError("queue index out of range")
+
+    def _rebuild(self, entries: List[QueueEntry]):
+        self._chunks = [entries[i:i + self.CHUNK_SIZE] for i in range(0, len(entries), self.CHUNK_SIZE)]
+
+    # --- Sequence Protocol ---
+    def __len__(self) -> int:
+        return self._len
+
+    def __bool__(self) -> bool:
+        return self._len > 0
+
+    def __iter__(self) -> Iterator[QueueEntry]:
+        return itertools.chain.from_iterable(self._chunks)
+
+    def __getitem__(self, index: int) -> QueueEntry:
+        chunk_index, offset = self._locate(index)
+        return self._chunks[chunk_index][offset]
+
+    def page(self, start: int, stop: int) -> List[QueueEntry]:
+        """Returns entries [start, stop) without materializing the whole queue."""
+        stop = min(stop, self._len)
+        if start >= stop:
+            return []
+        chunk_index, offset = self._locate(start)
+        result = []
+        while len(result) < stop - start:
+            chunk = self._chunks[chunk_index]
+            result.extend(chunk[offset:offset + (stop - start - len(result))])
+            chunk_index, offset = chunk_index + 1, 0
+        return result
+
+    # --- Mutation ---
+    def append(self, entry: QueueEntry):
+        if not self._chunks or len(self._chunks[-1]) >= self.CHUNK_SIZE:
+            self._chunks.append([])
+        self._chunks[-1].append(entry)
+        self._attach(entry)
+
+    def extend(self, entries: Iterable[QueueEntry]):
+        for entry in entries:
+            self.append(entry)
+
+    def insert(self, index: int, entry: QueueEntry):
+        """Inserts before position `index`; an index past the end appends."""
+        if index >= self._len or not self._chunks:
+            self.append(entry)
+            return
+        chunk_index, offset = self._locate(max(index, -self._len))
+        chunk = self._chunks[chunk_index]
+        chunk.insert(offset, entry)
+        if len(chunk) > 2 * self.CHUNK_SIZE: # Split oversized chunks to keep inserts cheap
+            self._chunks[chunk_index:chunk_index + 1] = [chunk[:self.CHUNK_SIZE], chunk[self.CHUNK_SIZE:]]
+        self._attach(entry)
+
+    def appendleft(self, entry: QueueEntry):
+        self.insert(0, entry)
+
+    def pop(self, index: int = -1) -> QueueEntry:
+        chunk_index, offset = self._locate(index)
+        chunk = self._chunks[chunk_index]
+        entry = chunk.pop(offset)
+        if not chunk:
+            del self._chunks[chunk_index]
+        self._detach(entry)
+        return entry
+
+    def popleft(self) -> QueueEntry:
+        return self.pop(0)
+
+    def move(self, source: int, destination: int) -> QueueEntry:
+        """Moves the entry at `source` so it ends up at position `destination`."""
+        entry = self.pop(source)
+        self.insert(destination, entry)
+        return entry
+
+    def jump(self, index: int) -> int:
+        """Drops every entry before position `index`, returning how many were removed."""
+        if not 0 <= index < self._len:
+            raise IndexError("queue index out of range")
+        remaining = index
+        while remaining and len(self._chunks[0]) <= remaining:
+            chunk = self._chunks.pop(0)
+            remaining -= len(chunk)
+            for entry in chunk:
+                self._detach(entry)
+        if remaining:
+            dropped, self._chunks[0] = self._chunks[0][:remaining], self._chunks[0][remaining:]
+            for entry in dropped:
+                self._detach(entry)
+        return index
+
+    def shuffle(self):
+        entries = list(self)
+        random.shuffle(entries)
+        self._rebuild(entries)
+
+    def dedupe(self) -> int:
+        """Removes repeated entries (keeping the first occurrence), returning how many were removed."""
+        if not self._duplicates: # Cheap no-op when the counts show nothing is repeated
+            return 0
+        seen, kept, removed = set(), [], []
+        for entry in self:
+            if entry.key in seen:
+                removed.append(entry)
+            else:
+                seen.add(entry.key)
+                kept.append(entry)
+        for entry in removed:
+            self._detach(entry)
+        self._rebuild(kept)
+        return len(removed)
+
+    def clear(self):
+        for entry in self:
+            entry._queue = None
+        self._chunks = []
+        self._len = 0
+        self._counts.clear()
+        self._duplicates = 0
+        self.total_duration = 0
+        self.unknown_durations = 0
@@ -1,11 +1,26 @@
 import discord
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 import asyncio
 import os
 import logging
 import collections # For deque
-from typing import Optional # For type hints
+import hashlib
+import re
+import shutil
+import subprocess
+import tempfile
+from typing import Awaitable, Optional # For type hints
+
+import mutagen
+
+import handoff
+from inflight import InflightRegistry
+from loudness import LoudnessAnalyzer
+from process_runner import ProcessTimeoutError, run_process
+from spotify_metadata import SpotifyMetadataResolver, TrackMetadata, default_client
+from track_index import TrackIndex
+from track_queue import QueueEntry, TrackQueue
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -13,29 +28,339 @@ log = logging.getLogger(__name__)
 
 # Define the cache directory
 CACHE_DIR = "music_cache"
+# Downloaded tracks shared by every guild, named after their track key
+TRACKS_DIR = os.path.join(CACHE_DIR, "tracks")
+AUDIO_EXTENSIONS = ('.opus', '.mp3', '.m4a', '.flac', '.ogg')
+# Metadata of every track played so far, used for /play autocomplete
+TRACK_INDEX_PATH = os.path.join(CACHE_DIR, "track_index.json")
+# Per-track normalization gains, measured once after each download
+LOUDNESS_PATH = os.path.join(CACHE_DIR, "loudness.json")
+# Entries shown per page of /queue
+QUEUE_PAGE_SIZE = 10
+
+# Seconds to stay connected with nothing playing before leaving the voice channel
+IDLE_DISCONNECT_SECONDS = int(os.getenv("IDLE_DISCONNECT_SECONDS", "300"))
+# Seconds to stay connected once every human has left the voice channel
+ALONE_DISCONNECT_SECONDS = int(os.getenv("ALONE_DISCONNECT_SECONDS", "30"))
+# Hard limit for one spotdl run (albums and playlists get four times as long)
+DOWNLOAD_TIMEOUT_SECONDS = int(os.getenv("DOWNLOAD_TIMEOUT_SECONDS", "300"))
+# How often state left behind by guilds the bot isn't connected in is dropped
+STALE_STATE_SWEEP_MINUTES = 10
+
+SPOTIFY_LINK_PATTERN = re.compile(r"open\.spotify\.com/(?:intl-[\w-]+/)?(track|album|playlist)/([A-Za-z0-9]+)")
+
+
+def track_key(link: str) -> str:
+    """Returns a stable identity for a link, so the same track maps to the same download."""
+    match = SPOTIFY_LINK_PATTERN.search(link)
+    if match:
+        return f"{match.group(1)}_{match.group(2)}"
+    return hashlib.sha1(link.strip().encode()).hexdigest()
+
+
+def spotify_track_id(link: str) -> Optional[str]:
+    """Returns the Spotify track ID of a track link, or None for anything else."""
+    match = SPOTIFY_LINK_PATTERN.search(link)
+    return match.group(2) if match and match.group(1) == "track" else None
+
+
+def format_duration(seconds: int) -> str:
+    """Formats seconds as H:MM:SS or M:SS."""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class DownloadError(Exception):
+    """Raised when spotdl fails or its output file can't be found."""
+
+
+class QueuePageView(discord.ui.View):
+    """Previous/next buttons for /queue; each click renders only the requested page."""
+
+    def __init__(self, cog: "VoiceCommands", guild_id: int, page: int = 0):
+        super().__init__(timeout=120)
+        self.cog = cog
+        self.guild_id = guild_id
+        self.page = page
+
+    def render(self) -> discord.Embed:
+        embed, self.page, page_count = self.cog._build_queue_embed(self.guild_id, self.page)
+        self.previous_page.disabled = self.page <= 0
+        self.next_page.disabled = self.page >= page_count - 1
+        return embed
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page -= 1
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+
+async def _dispatch_after_playing(bot: commands.Bot, guild_id: int, finished_track_path: Optional[str], error: Optional[Exception]):
+    """Runs the after-playing handler of whichever VoiceCommands instance is loaded when a song ends."""
+    cog = bot.get_cog("VoiceCommands")
+    # A song ending mid-/reload waits the few milliseconds until the new instance is registered
+    while cog is None and __name__ in getattr(bot, "reloading_extensions", ()):
+        await asyncio.sleep(0.05)
+        cog = bot.get_cog("VoiceCommands")
+    if cog is None: # Unloaded for good; nothing left to advance the queue
+        return
+    await cog._after_playing(guild_id, finished_track_path, error)
+
 
 class VoiceCommands(commands.Cog):
+    HANDOFF_ATTRIBUTES = (
+        "queues", "current_track", "predownload_tasks", "predownloaded_link", "predownloaded_path",
+        "current_track_path", "idle_tasks", "downloads", "track_refs", "track_index", "metadata", "loudness",
+        "disconnecting",
+    )
+
     def __init__(self, bot: commands.Bot): # Added type hint for bot
         self.bot = bot
-        self.queues = {} # {guild_id: collections.deque()}
-        self.current_track = {} # {guild_id: link}
-        self.predownload_tasks = {} # {guild_id: asyncio.Task}
-        self.predownloaded_link = {} # {guild_id: link}
-        self.predownloaded_path = {} # {guild_id: path}
-        # Create cache directory if it doesn't exist
-        if not os.path.exists(CACHE_DIR):
-            os.makedirs(CACHE_DIR)
-
-    def get_queue(self, guild_id: int) -> collections.deque:
+        # After a /reload, keep playing from the previous instance's queues, files and downloads.
+        # Anything it didn't hand over (e.g. state added by the new version) is built as usual.
+        self.restored = handoff.restore(bot, self)
+        if "queues" not in self.restored:
+            self.queues = {} # {guild_id: TrackQueue}
+        if "current_track" not in self.restored:
+            self.current_track = {} # {guild_id: link}
+        if "predownload_tasks" not in self.restored:
+            self.predownload_tasks = {} # {guild_id: asyncio.Task}
+        if "predownloaded_link" not in self.restored:
+            self.predownloaded_link = {} # {guild_id: link}
+        if "predownloaded_path" not in self.restored:
+            self.predownloaded_path = {} # {guild_id: path}
+        if "current_track_path" not in self.restored:
+            self.current_track_path = {} # {guild_id: path}
+        if "idle_tasks" not in self.restored:
+            self.idle_tasks = {} # {guild_id: asyncio.Task}
+        if "downloads" not in self.restored:
+            self.downloads = InflightRegistry() # {track_key: shared download job}, shared across guilds
+        if "track_refs" not in self.restored:
+            self.track_refs = collections.Counter() # {path: number of guilds using the file}
+            # Start from an empty track cache; files from a previous run have no owners
+            shutil.rmtree(TRACKS_DIR, ignore_errors=True)
+            os.makedirs(TRACKS_DIR, exist_ok=True)
+        if "track_index" not in self.restored:
+            self.track_index = TrackIndex(TRACK_INDEX_PATH)
+            self.track_index.load()
+        if "metadata" not in self.restored:
+            # Batched Spotify lookups that fill in titles/durations for queued links
+            self.metadata = SpotifyMetadataResolver(default_client())
+        if "loudness" not in self.restored:
+            # Loudness measured in the background, applied as a fixed gain at playback
+            self.loudness = LoudnessAnalyzer(LOUDNESS_PATH)
+            self.loudness.load()
+        if "disconnecting" not in self.restored:
+            self.disconnecting = set() # Guilds whose idle disconnect is in progress
+        self.metadata.on_resolved = self._on_metadata_resolved
+
+    async def cog_load(self):
+        # A handed-over resolver and analyzer are already running
+        if "metadata" not in self.restored:
+            await self.metadata.start()
+        if "loudness" not in self.restored:
+            self.loudness.start()
+        self.stale_state_sweeper.start()
+
+    async def cog_unload(self):
+        """Cancels pending idle timers and pre-downloads when the cog is unloaded."""
+        self.stale_state_sweeper.cancel()
+        if handoff.stash(self.bot, self): # Reloading: the new instance takes everything over
+            return
+        for task in list(self.idle_tasks.values()):
+            task.cancel()
+        self.idle_tasks.clear()
+        for guild_id in list(self.predownload_tasks):
+            await self._cancel_predownload(guild_id)
+        self.downloads.cancel_all()
+        await self.metadata.close()
+        await self.loudness.close()
+
+    # --- Track Metadata ---
+    def _display_name(self, link: str) -> str:
+        """Returns "Title - Artists" for a link when its metadata is known, the link otherwise."""
+        track_id = spotify_track_id(link)
+        metadata = self.metadata.get(track_id) if track_id else None
+        return metadata.label if metadata else link
+
+    def _queue_entry(self, link: str) -> QueueEntry:
+        """Creates a queue entry and has its title/duration filled in once the batch resolver gets to it."""
+        entry = QueueEntry(link, key=track_key(link))
+        track_id = spotify_track_id(link)
+        if track_id:
+            self.metadata.request(track_id, lambda metadata: self._apply_metadata(entry, metadata))
+        return entry
+
+    @staticmethod
+    def _apply_metadata(entry: QueueEntry, metadata: Optional[TrackMetadata]):
+        if metadata is None:
+            return
+        entry.title = metadata.label
+        entry.duration = metadata.duration # Also updates the owning queue's total
+
+    def _on_metadata_resolved(self, resolved: list):
+        """Makes newly resolved tracks searchable in /play autocomplete."""
+        added = False
+        for metadata in resolved:
+            key = f"track_{metadata.id}"
+            if self.track_index.get(key) is None:
+                self.track_index.add(key, f"https://open.spotify.com/track/{metadata.id}", metadata.title, metadata.artists, metadata.album)
+                added = True
+        if added:
+            self.bot.loop.create_task(asyncio.to_thread(self.track_index.save))
+
+    def get_queue(self, guild_id: int) -> TrackQueue:
         """Gets the queue for a guild, creating it if it doesn't exist."""
-        return self.queues.setdefault(guild_id, collections.deque())
+        queue = self.queues.get(guild_id)
+        if queue is None:
+            queue = self.queues[guild_id] = TrackQueue()
+        return queue
 
-    def _get_next_track_path(self, guild_id: int) -> str:
-        """Returns the expected path for the pre-downloaded next track."""
-        return os.path.join(CACHE_DIR, f"{guild_id}_next_track.opus")
+    async def _refresh_predownload(self, guild_id: int, previous_head: Optional[QueueEntry]):
+        """Restarts the pre-download if a queue edit changed which song plays next."""
+        queue = self.get_queue(guild_id)
+        head = queue[0] if queue else None
+        if head is previous_head:
+            return
+        await self._cancel_predownload(guild_id)
+        guild = self.bot.get_guild(guild_id)
+        if head and guild and guild.voice_client and (guild.voice_client.is_playing() or guild.voice_client.is_paused()):
+            self.bot.loop.create_task(self._trigger_predownload(guild_id))
+
+    # --- Shared Track Cache ---
+    def _cached_track_path(self, key: str) -> Optional[str]:
+        """Returns the path of an already downloaded file for a track key, if there is one."""
+        for ext in AUDIO_EXTENSIONS:
+            path = os.path.join(TRACKS_DIR, f"{key}{ext}")
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _retain_track(self, path: str):
+        """Registers one more user (a guild's current or pre-downloaded track) of a cached file."""
+        self.track_refs[path] += 1
+
+    def _release_track(self, path: Optional[str]):
+        """Drops one user of a cached file and deletes the file once nobody uses it."""
+        if not path or path not in self.track_refs:
+            return
+        self.track_refs[path] -= 1
+        if self.track_refs[path] > 0:
+            return
+        del self.track_refs[path]
+        if os.path.exists(path):
+            try:
+                os.remove(path)
+                log.info(f"Deleted unused track file: {path}")
+            except OSError as e:
+                log.error(f"Error deleting track file {path}: {e}")
+
+    def _join_download(self, link: str) -> Awaitable[str]:
+        """Joins (or starts) the shared download job for a link. The result must be awaited."""
+        key = track_key(link)
+        return self.downloads.join(key, lambda: self._download_track(link, key))
+
+    async def _acquire_track(self, link: str, pending: Optional[Awaitable[str]] = None) -> str:
+        """Returns a local file for the link and retains it for the caller.
+
+        Concurrent requests for the same track (from any guild) share one download.
+        `pending` is an already joined download for this link, used when the caller had to
+        claim the job before releasing a pre-download of the same track.
+        """
+        key = track_key(link)
+        path = await pending if pending else None
+        for _ in range(2): # Retry once if the shared file was released while we were waiting
+            if path is None or not os.path.exists(path):
+                path = self._cached_track_path(key) or await self._join_download(link)
+            if os.path.exists(path):
+                self._retain_track(path)
+                return path
+            path = None
+        raise DownloadError("The downloaded file disappeared before it could be played.")
+
+    async def _download_track(self, link: str, key: str) -> str:
+        """Runs spotdl for a link and moves the result into the shared track cache."""
+        cached = self._cached_track_path(key)
+        if cached:
+            return cached
+
+        # Download into a private directory so half-written files never show up in the cache.
+        # Unique per job: a cancelled job for this key may still be cleaning up its own directory.
+        work_dir = tempfile.mkdtemp(prefix=f"{key}.", suffix=".partial", dir=TRACKS_DIR)
+        output_template = os.path.join(work_dir, "{artists} - {title}.{output-ext}")
+
+        command = [shutil.which("spotdl") or "spotdl", link, "--output", output_template, "--format", "opus", "--log-level", "ERROR"]
+        # Albums and playlists download many tracks in one run
+        timeout = DOWNLOAD_TIMEOUT_SECONDS * (4 if key.startswith(("album_", "playlist_")) else 1)
+        log.info(f"Running spotdl for track {key}: {subprocess.list2cmdline(command)}")
+        try:
+            # No shell, own process group: a cancel or timeout kills spotdl together with its FFmpeg/yt-dlp children
+            try:
+                returncode, stdout, stderr = await run_process(*command, timeout=timeout)
+            except ProcessTimeoutError as e:
+                log.error(f"spotdl timed out for track {key}: {e}")
+                raise DownloadError(f"The download took longer than {timeout}s and was stopped.") from e
+            except FileNotFoundError as e:
+                raise DownloadError("spotdl is not installed.") from e
+
+            if returncode != 0:
+                error_message = stderr.decode(errors="replace").strip() or stdout.decode(errors="replace").strip()
+                log.error(f"spotdl failed for track {key}: {error_message}")
+                raise DownloadError(error_message.splitlines()[-1] if error_message else "Unknown download error.")
+
+            # --- Find the downloaded file ---
+            downloaded_file = None
+            files_in_dir = sorted(f for f in os.listdir(work_dir) if os.path.isfile(os.path.join(work_dir, f)))
+            for file in files_in_dir:
+                if file.lower().endswith('.opus'):
+                    downloaded_file = file
+                    break
+            if not downloaded_file: # Fallback
+                for file in files_in_dir:
+                    if file.lower().endswith(AUDIO_EXTENSIONS):
+                        downloaded_file = file
+                        log.warning(f"Found non-opus file ({file}) for track {key} despite requesting opus.")
+                        break
+            if not downloaded_file:
+                raise DownloadError("Download finished, but couldn't find the audio file.")
+
+            final_path = os.path.join(TRACKS_DIR, f"{key}{os.path.splitext(downloaded_file)[1].lower()}")
+            os.replace(os.path.join(work_dir, downloaded_file), final_path)
+            log.info(f"Downloaded track {key}: {final_path}")
+            self.loudness.submit(key, final_path)
+            if not key.startswith(("album_", "playlist_")): # Only single tracks describe themselves
+                self.bot.loop.create_task(self._index_track(link, key, final_path))
+            return final_path
+        finally:
+            # Runs after the process group is dead, so nothing is still writing partial files
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    async def _index_track(self, link: str, key: str, path: str):
+        """Reads the tags spotdl embedded in a downloaded file and adds the track to the autocomplete index."""
+        def read_tags():
+            audio = mutagen.File(path, easy=True)
+            tags = audio.tags if audio is not None and audio.tags else {}
+            first = lambda name: (tags.get(name) or [""])[0]
+            return first("title"), first("artist"), first("album")
+
+        try:
+            title, artist, album = await asyncio.to_thread(read_tags)
+        except Exception as e:
+            log.warning(f"Could not read tags for track {key}: {e}")
+            return
+        if not title:
+            return
+        self.track_index.add(key, link.split("?")[0], title, artist, album)
+        await asyncio.to_thread(self.track_index.save)
 
     async def _cancel_predownload(self, guild_id: int):
-        """Cancels the pre-download task and cleans up state/files."""
+        """Cancels the pre-download task and releases the pre-downloaded file."""
         task = self.predownload_tasks.pop(guild_id, None)
         if task and not task.done():
             task.cancel()
@@ -48,51 +373,131 @@ class VoiceCommands(commands.Cog):
             except Exception as e:
                 log.error(f"Error during pre-download task cancellation for guild {guild_id}: {e}")
 
-
-        # Clear state
+        # Clear state; the shared file is only deleted if no other guild is using it
         self.predownloaded_link.pop(guild_id, None)
-        predownloaded_file = self.predownloaded_path.pop(guild_id, None)
+        self._release_track(self.predownloaded_path.pop(guild_id, None))
 
-        # Delete the temporary next track file if it exists
-        next_track_file = self._get_next_track_path(guild_id)
-        if os.path.exists(next_track_file):
-            try:
-                os.remove(next_track_file)
-                log.info(f"Removed pre-downloaded file for guild {guild_id}: {next_track_file}")
-            except OSError as e:
-                log.error(f"Error removing pre-downloaded file {next_track_file}: {e}")
-        elif predownloaded_file and os.path.exists(predownloaded_file): # Check the stored path too
-             try:
-                 os.remove(predownloaded_file)
-                 log.info(f"Removed pre-downloaded file (from state) for guild {guild_id}: {predownloaded_file}")
-             except OSError as e:
-                 log.error(f"Error removing pre-downloaded file {predownloaded_file}: {e}")
+    # --- Inactivity Management ---
+    def _schedule_idle_disconnect(self, guild_id: int, delay: int = IDLE_DISCONNECT_SECONDS, reason: str = "inactivity"):
+        """(Re)starts the timer that disconnects the bot from voice in a guild after `delay` seconds."""
+        self._cancel_idle_disconnect(guild_id)
+        if delay <= 0: # A non-positive timeout disables auto-disconnect
+            return
+        task = self.bot.loop.create_task(self._idle_disconnect(guild_id, delay, reason))
+        self.idle_tasks[guild_id] = task
+        # Only forget the task if it is still the registered one (a newer timer may have replaced it)
+        task.add_done_callback(lambda t: self.idle_tasks.pop(guild_id, None) if self.idle_tasks.get(guild_id) is t else None)
+        log.debug(f"Scheduled idle disconnect for guild {guild_id} in {delay}s ({reason})")
+
+    def _cancel_idle_disconnect(self, guild_id: int):
+        """Cancels a pending idle disconnect for a guild, if any."""
+        task = self.idle_tasks.pop(guild_id, None)
+        if task and not task.done():
+            task.cancel()
+            log.debug(f"Cancelled idle disconnect for guild {guild_id}")
 
+    def _humans_in_channel(self, voice_client: discord.VoiceClient) -> int:
+        """Counts the non-bot members in the voice client's channel."""
+        if not voice_client or not voice_client.channel:
+            return 0
+        return sum(1 for member in voice_client.channel.members if not member.bot)
 
-    async def _play_song(self, guild_id: int, link: str, interaction_channel: Optional[discord.TextChannel] = None, previous_track_path: Optional[str] = None):
-        """Downloads (or uses pre-downloaded) and plays a single song. Deletes previous track's file."""
+    async def _idle_disconnect(self, guild_id: int, delay: int, reason: str):
+        """Waits out the idle period, then disconnects and releases the guild's resources."""
+        await asyncio.sleep(delay)
 
-        # --- Delete Previous Track File ---
-        if previous_track_path and os.path.exists(previous_track_path):
+        guild = self.bot.get_guild(guild_id)
+        voice_client = guild.voice_client if guild else None
+        if voice_client and voice_client.is_connected():
+            # Re-check: something may have started playing or someone may have come back
+            if (voice_client.is_playing() or voice_client.is_paused()) and self._humans_in_channel(voice_client) > 0:
+                log.debug(f"Idle disconnect for guild {guild_id} skipped, playback is active.")
+                return
+            log.info(f"Disconnecting from voice in guild {guild_id} due to {reason}.")
+            # Drop the registration first so _cleanup_guild doesn't cancel this running task
+            self.idle_tasks.pop(guild_id, None)
+            self.disconnecting.add(guild_id)
             try:
-                os.remove(previous_track_path)
-                log.info(f"Deleted previous track file for guild {guild_id}: {previous_track_path}")
-            except OSError as e:
-                log.error(f"Error deleting previous track file {previous_track_path} for guild {guild_id}: {e}")
-        elif previous_track_path:
-            log.warning(f"Tried to delete previous track file for guild {guild_id}, but it didn't exist: {previous_track_path}")
+                await voice_client.disconnect()
+            except Exception as e:
+                log.error(f"Error disconnecting from voice in guild {guild_id}: {e}")
+        try:
+            await self._cleanup_guild(guild_id)
+        finally:
+            self.disconnecting.discard(guild_id)
 
-        # --- Existing Logic ---
-        # Cancel any existing pre-download for *this* guild before starting playback/new download
+    async def _cleanup_guild(self, guild_id: int):
+        """Cancels outstanding work and drops all in-memory state held for a guild."""
+        self._cancel_idle_disconnect(guild_id)
         await self._cancel_predownload(guild_id)
 
+        queue = self.queues.pop(guild_id, None)
+        if queue:
+            queue.clear()
+        self.current_track.pop(guild_id, None)
+
+        # Release the file of the track that was playing
+        self._release_track(self.current_track_path.pop(guild_id, None))
+        log.info(f"Released voice state for guild {guild_id}")
+
+    @tasks.loop(minutes=STALE_STATE_SWEEP_MINUTES)
+    async def stale_state_sweeper(self):
+        """Drops per-guild state for guilds without a voice connection (e.g. a /queue or a failed /play
+        in a guild the bot never joined), so the dicts don't grow with every guild ever seen."""
+        guild_ids = set(self.queues) | set(self.current_track) | set(self.current_track_path) | set(self.predownloaded_path)
+        for guild_id in guild_ids:
+            guild = self.bot.get_guild(guild_id)
+            if guild and guild.voice_client and guild.voice_client.is_connected():
+                continue
+            if guild_id in self.predownload_tasks or guild_id in self.idle_tasks: # Still winding down
+                continue
+            await self._cleanup_guild(guild_id)
+
+    @stale_state_sweeper.before_loop
+    async def before_stale_state_sweeper(self):
+        await self.bot.wait_until_ready()
+
+    @commands.Cog.listener()
+    async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
+        """Tracks voice channel membership to leave empty channels and clean up after disconnects."""
+        guild = member.guild
+        voice_client = guild.voice_client
+
+        # The bot itself was disconnected (kicked, channel deleted, or our own disconnect)
+        if member.id == self.bot.user.id:
+            if after.channel is None:
+                await self._cleanup_guild(guild.id)
+            return
+
+        if not voice_client or not voice_client.channel:
+            return
+        # Only care about members entering or leaving the bot's channel
+        if voice_client.channel not in (before.channel, after.channel) or before.channel == after.channel:
+            return
+
+        if self._humans_in_channel(voice_client) == 0:
+            self._schedule_idle_disconnect(guild.id, ALONE_DISCONNECT_SECONDS, reason="an empty voice channel")
+        elif voice_client.is_playing() or voice_client.is_paused():
+            self._cancel_idle_disconnect(guild.id)
+        elif after.channel == voice_client.channel:
+            # Someone joined while nothing plays: swap the short "alone" timer for the regular idle one
+            self._schedule_idle_disconnect(guild.id)
+
+    async def _play_song(self, guild_id: int, link: str, interaction_channel: Optional[discord.TextChannel] = None, previous_track_path: Optional[str] = None):
+        """Downloads (or uses pre-downloaded) and plays a single song. Releases the previous track's file."""
+
+        # --- Release Previous Track File ---
+        self._release_track(previous_track_path)
+
         guild = self.bot.get_guild(guild_id)
         if not guild:
             log.error(f"_play_song: Guild {guild_id} not found.")
+            await self._cancel_predownload(guild_id)
             return False
         voice_client = guild.voice_client
         if not voice_client or not voice_client.is_connected():
             log.error(f"_play_song: Not connected to voice in guild {guild_id}.")
+            await self._cancel_predownload(guild_id)
             # Attempt to notify if we have a channel
             if interaction_channel:
                 try: await interaction_channel.send("I'm not connected to a voice channel anymore.")
@@ -101,6 +506,7 @@ class VoiceCommands(commands.Cog):
 
         downloaded_file = None
         used_predownload = False
+        pending_download = None
 
         # --- Check for Pre-downloaded File ---
         predownload_link = self.predownloaded_link.get(guild_id)
@@ -110,61 +516,26 @@ class VoiceCommands(commands.Cog):
             log.info(f"Using pre-downloaded file for guild {guild_id}: {predownload_path}")
             downloaded_file = predownload_path
             used_predownload = True
-            # Clear pre-download state as it's now being used
+            # The pre-download's reference now belongs to playback
             self.predownloaded_link.pop(guild_id, None)
             self.predownloaded_path.pop(guild_id, None)
-        else:
-            # --- Normal Download Logic ---
-            log.info(f"Pre-downloaded file not available or doesn't match for guild {guild_id}. Downloading normally.")
-            # Using a consistent name per guild for simplicity since cleanup is disabled
-            # Spotdl seems to create a directory even with simple output, let's stick to that pattern
-            output_template = os.path.join(CACHE_DIR, f"{guild_id}_current_track.%(ext)s")
-            potential_output_dir = os.path.join(CACHE_DIR, f"{guild_id}_current_track.%(ext)s")
+        elif not self._cached_track_path(track_key(link)):
+            # Claim the download before cancelling the pre-download, so a skip landing
+            # mid-prefetch of this same track joins that download instead of restarting it
+            pending_download = self._join_download(link)
 
-            command = f'spotdl "{link}" --output "{output_template}" --format opus --log-level ERROR'
-            log.info(f"Running spotdl command for guild {guild_id}: {command}")
+        # Cancel any other pre-download for *this* guild before starting playback
+        await self._cancel_predownload(guild_id)
 
+        if not downloaded_file:
+            log.info(f"Pre-downloaded file not available or doesn't match for guild {guild_id}. Fetching track.")
             try:
-                process = await asyncio.create_subprocess_shell(
-                    command,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                stdout, stderr = await process.communicate()
-
-                if process.returncode != 0:
-                    error_message = stderr.decode().strip() or stdout.decode().strip()
-                    log.error(f"spotdl failed for guild {guild_id}: {error_message}")
-                    user_error = error_message.splitlines()[-1] if error_message else "Unknown download error."
-                    if interaction_channel:
-                        try: await interaction_channel.send(f"Failed to download song: {user_error}")
-                        except discord.HTTPException: pass
-                    return False # Download failed
-
-                # --- Find the downloaded file ---
-                if os.path.isdir(potential_output_dir):
-                    try:
-                        files_in_dir = [f for f in os.listdir(potential_output_dir) if os.path.isfile(os.path.join(potential_output_dir, f))]
-                        for file in files_in_dir:
-                            if file.lower().endswith('.opus'):
-                                downloaded_file = os.path.join(potential_output_dir, file)
-                                break
-                        if not downloaded_file: # Fallback
-                             for file in files_in_dir:
-                                 if file.lower().endswith(('.mp3', '.m4a', '.flac', '.ogg')):
-                                     downloaded_file = os.path.join(potential_output_dir, file)
-                                     log.warning(f"Found non-opus file ({file}) in cache dir for guild {guild_id} despite requesting opus.")
-                                     break
-                    except OSError as e:
-                        log.error(f"Error listing files in cache directory {potential_output_dir}: {e}")
-
-                # Fallback checks (old style)
-                if not downloaded_file:
-                    potential_file_opus = os.path.join(CACHE_DIR, f"{guild_id}_current_track.opus")
-                    potential_file_mp3 = os.path.join(CACHE_DIR, f"{guild_id}_current_track.mp3")
-                    if os.path.exists(potential_file_opus): downloaded_file = potential_file_opus
-                    elif os.path.exists(potential_file_mp3): downloaded_file = potential_file_mp3
-
+                downloaded_file = await self._acquire_track(link, pending_download)
+            except DownloadError as e:
+                if interaction_channel:
+                    try: await interaction_channel.send(f"Failed to download song: {e}")
+                    except discord.HTTPException: pass
+                return False # Download failed
             except Exception as e: # Catch errors during download process
                  log.exception(f"An unexpected error occurred during download for guild {guild_id}:")
                  if interaction_channel:
@@ -173,30 +544,31 @@ class VoiceCommands(commands.Cog):
                  return False # Download failed
 
         # --- Playback ---
-        if not downloaded_file:
-            log.error(f"Download process finished for guild {guild_id} but failed to locate the final audio file.")
-            if interaction_channel:
-                try: await interaction_channel.send("Download finished, but couldn't find the audio file.")
-                except discord.HTTPException: pass
-            return False
-
         log.info(f"Attempting to play for guild {guild_id}: {downloaded_file}")
         if interaction_channel and not used_predownload: # Announce only if it wasn't pre-downloaded (already announced)
-             try: await interaction_channel.send(f"Now playing: `{link}`")
+             try: await interaction_channel.send(f"Now playing: `{self._display_name(link)}`")
              except discord.HTTPException: pass
         elif interaction_channel and used_predownload: # Announce we're using the pre-download
-             try: await interaction_channel.send(f"Now playing (pre-downloaded): `{link}`")
+             try: await interaction_channel.send(f"Now playing (pre-downloaded): `{self._display_name(link)}`")
              except discord.HTTPException: pass
 
 
+        # Pre-downloaded tracks were analysed while the previous song played; a fresh download plays at once,
+        # unadjusted, rather than waiting behind a full measurement pass
+        gain = await self.loudness.gain(track_key(link))
+
         try: # Start playback block
-            audio_source = discord.FFmpegPCMAudio(downloaded_file)
+            # A fixed volume filter is all playback costs; the measurement happened once, after the download
+            audio_source = discord.FFmpegPCMAudio(downloaded_file, options=f"-filter:a volume={gain}dB" if gain else None)
             # Store the link of the track being played
             self.current_track[guild_id] = link
-            # Use lambda to pass guild_id and the path of the *current* file to the after callback handler
+            self.current_track_path[guild_id] = downloaded_file
+            # The callback looks the cog up when the song ends, so a /reload mid-song hands playback to the new instance
             current_file_path = downloaded_file
-            voice_client.play(audio_source, after=lambda e: self.bot.loop.create_task(self._after_playing(guild_id, current_file_path, e))) # Pass path of song *just played*
+            bot = self.bot
+            voice_client.play(audio_source, after=lambda e: asyncio.run_coroutine_threadsafe(_dispatch_after_playing(bot, guild_id, current_file_path, e), bot.loop)) # Pass path of song *just played*
             log.info(f"Started playing {current_file_path} in guild {guild_id}")
+            self._cancel_idle_disconnect(guild_id)
 
             # --- Trigger Pre-download for the NEXT song ---
             self.bot.loop.create_task(self._trigger_predownload(guild_id))
@@ -210,6 +582,8 @@ class VoiceCommands(commands.Cog):
                 except discord.HTTPException: pass
             # Clear current track info if playback failed to start
             self.current_track.pop(guild_id, None)
+            self.current_track_path.pop(guild_id, None)
+            self._release_track(downloaded_file)
             return False # Playback failed
 
 
@@ -226,100 +600,64 @@ class VoiceCommands(commands.Cog):
             log.debug(f"Queue empty for guild {guild_id}, not pre-downloading.")
             return
 
-        next_link = queue[0] # Peek at the next item without removing it
+        next_link = queue[0].link # Peek at the next item without removing it
         log.info(f"Triggering pre-download for next song in queue for guild {guild_id}: {next_link}")
 
         task = self.bot.loop.create_task(self._predownload_next(guild_id, next_link))
         self.predownload_tasks[guild_id] = task
 
         # Add callback to remove task from dict when done (handles success, failure, cancellation)
-        task.add_done_callback(lambda t: self.predownload_tasks.pop(guild_id, None))
+        task.add_done_callback(lambda t: self.predownload_tasks.pop(guild_id, None) if self.predownload_tasks.get(guild_id) is t else None)
 
 
     async def _predownload_next(self, guild_id: int, link: str):
-        """Downloads the next song in the queue to a temporary location."""
+        """Fetches the next song in the queue into the shared track cache ahead of time."""
         log.info(f"Starting pre-download task for guild {guild_id}: {link}")
-        output_path = self._get_next_track_path(guild_id)
-        # Use a simple output filename template for pre-download
-        output_template = os.path.join(CACHE_DIR, f"{guild_id}_next_track")
-
-        # Clean up any existing temp file first
-        if os.path.exists(output_path):
-            try:
-                os.remove(output_path)
-                log.debug(f"Removed existing temp file before pre-download: {output_path}")
-            except OSError as e:
-                log.error(f"Error removing existing temp file {output_path}: {e}")
-                # Don't necessarily stop, maybe spotdl can overwrite
-
-        command = f'spotdl "{link}" --output "{output_template}" --format opus --log-level ERROR'
-        process = None
         try:
-            process = await asyncio.create_subprocess_shell(
-                command,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, stderr = await process.communicate()
-
-            if process.returncode == 0:
-                # Check if the expected file exists
-                if os.path.exists(output_path):
-                    self.predownloaded_link[guild_id] = link
-                    self.predownloaded_path[guild_id] = output_path
-                    log.info(f"Successfully pre-downloaded for guild {guild_id}: {output_path}")
-                else:
-                    log.error(f"Pre-download spotdl finished for guild {guild_id} but output file not found: {output_path}")
-                    # Clean up potentially incorrect state
-                    self.predownloaded_link.pop(guild_id, None)
-                    self.predownloaded_path.pop(guild_id, None)
-            else:
-                error_message = stderr.decode().strip() or stdout.decode().strip()
-                log.error(f"Pre-download spotdl failed for guild {guild_id}: {error_message}")
-                # Clean up state
-                self.predownloaded_link.pop(guild_id, None)
-                self.predownloaded_path.pop(guild_id, None)
-
+            path = await self._acquire_track(link)
         except asyncio.CancelledError:
              log.info(f"Pre-download task cancelled for guild {guild_id}.")
-             # Ensure temp file is deleted on cancellation
-             if os.path.exists(output_path):
-                 try: os.remove(output_path)
-                 except OSError: pass
              raise # Re-raise cancellation
-
-        except Exception as e:
+        except DownloadError as e:
+            log.error(f"Pre-download failed for guild {guild_id}: {e}")
+            return
+        except Exception:
             log.exception(f"Error during pre-download task for guild {guild_id}:")
-            # Clean up state on unexpected error
-            self.predownloaded_link.pop(guild_id, None)
-            self.predownloaded_path.pop(guild_id, None)
-            if os.path.exists(output_path):
-                 try: os.remove(output_path)
-                 except OSError: pass
-        finally:
-             # Ensure task is removed from dict if it finishes normally or with exception
-             # (Done callback handles this now)
-             pass
+            return
+
+        # Drop any stale pre-download before recording the new one
+        self._release_track(self.predownloaded_path.pop(guild_id, None))
+        self.predownloaded_link[guild_id] = link
+        self.predownloaded_path[guild_id] = path
+        log.info(f"Successfully pre-downloaded for guild {guild_id}: {path}")
 
 
     async def _after_playing(self, guild_id: int, finished_track_path: Optional[str], error: Optional[Exception]):
         """Callback run after a song finishes playing. Plays the next song if available."""
-        # --- REMOVED Deletion Logic from here ---
-
-        # --- Original Logic ---
         # Clear current track info *before* starting next song
         current_finished_link = self.current_track.pop(guild_id, None) # Keep link tracking for queue display etc.
+        # Take ownership of the finished file's reference (it may already have been released by a cleanup)
+        finished_track_path = self.current_track_path.pop(guild_id, None)
         log.info(f"Cleared current track info for guild {guild_id} (was: {current_finished_link})")
 
         if error:
             log.error(f'Error during playback for guild {guild_id}: {error}')
             # Optionally, notify a channel if possible
 
+        # Disconnecting stops the player, which lands here while (or after) the guild is being cleaned up:
+        # don't start the next song or recreate the guild's queue and idle timer in that case
+        guild = self.bot.get_guild(guild_id)
+        voice_client = guild.voice_client if guild else None
+        if guild_id in self.disconnecting or not voice_client or not voice_client.is_connected():
+            log.info(f"Not connected to voice in guild {guild_id} anymore, not advancing the queue.")
+            self._release_track(finished_track_path)
+            return
+
         log.info(f'Finished playing song in guild {guild_id}. Checking queue.')
         queue = self.get_queue(guild_id)
 
         if queue:
-            next_link = queue.popleft()
+            next_link = queue.popleft().link
             log.info(f"Playing next song from queue for guild {guild_id}: {next_link}")
             # Try to find a text channel to announce in (this is tricky without context)
             # A simple approach: find the first text channel the bot can see in the guild
@@ -334,18 +672,12 @@ class VoiceCommands(commands.Cog):
             await self._play_song(guild_id, next_link, interaction_channel=announce_channel, previous_track_path=finished_track_path)
         else:
             log.info(f"Queue empty for guild {guild_id}. Playback stopped.")
-            # --- Delete the VERY LAST track file when queue is empty ---
-            if finished_track_path and os.path.exists(finished_track_path):
-                try:
-                    os.remove(finished_track_path)
-                    log.info(f"Deleted final track file for guild {guild_id}: {finished_track_path}")
-                except OSError as e:
-                    log.error(f"Error deleting final track file {finished_track_path} for guild {guild_id}: {e}")
-            elif finished_track_path:
-                 log.warning(f"Tried to delete final track file for guild {guild_id}, but it didn't exist: {finished_track_path}")
+            # --- Release the VERY LAST track file when queue is empty ---
+            self._release_track(finished_track_path)
 
             await self._cancel_predownload(guild_id) # Cancel pre-download when stopping
-            # Optionally, implement auto-disconnect after inactivity here
+            # Leave the voice channel if nothing new gets queued for a while
+            self._schedule_idle_disconnect(guild_id)
 
 
     # Updated helper to only accept Context
@@ -416,13 +748,16 @@ class VoiceCommands(commands.Cog):
 
         # Send confirmation only if successful
         if voice_client:
+             # Don't sit in the channel forever if nothing gets played
+             if not voice_client.is_playing() and not voice_client.is_paused():
+                 self._schedule_idle_disconnect(ctx.guild.id)
              # Use ctx.send() which handles both interaction followup and regular message reply
              await ctx.send(f'Joined {voice_client.channel.name}', ephemeral=is_interaction)
         # _ensure_voice handles the error message if connection failed
 
     # Refactored using commands.hybrid_command
     @commands.hybrid_command(name='play', description='Adds a song/playlist/album to the queue.', aliases=['p'])
-    @app_commands.describe(link='The Spotify track/album/playlist link') # Keep describe for slash command help
+    @app_commands.describe(link='The Spotify track/album/playlist link, or start typing to search songs played before') # Keep describe for slash command help
     async def play(self, ctx: commands.Context, *, link: str):
         """Adds a song from a Spotify link to the queue and starts playing if idle."""
         is_interaction = ctx.interaction is not None
@@ -450,15 +785,16 @@ class VoiceCommands(commands.Cog):
             return
 
         # Add to queue
-        queue.append(link)
+        entry = self._queue_entry(link)
+        queue.append(entry)
         log.info(f"Added to queue for guild {guild_id}: {link}")
-        await ctx.send(f"Added to queue: `{link}`") # Use ctx.send for hybrid compatibility
+        await ctx.send(f"Added to queue: `{entry.display}`") # Use ctx.send for hybrid compatibility
 
         # If not already playing, start playback
         if not voice_client.is_playing() and not voice_client.is_paused():
             log.info(f"Nothing playing in guild {guild_id}, starting playback immediately.")
             # Pop the link we just added (or the first one if others were added concurrently)
-            next_link = queue.popleft()
+            next_link = queue.popleft().link
             # Start playing - pass ctx.channel for announcements, no previous track path for initial play
             await self._play_song(guild_id, next_link, interaction_channel=ctx.channel, previous_track_path=None)
         else:
@@ -469,10 +805,52 @@ class VoiceCommands(commands.Cog):
             try: await ctx.message.remove_reaction("⏳", self.bot.user)
             except (discord.Forbidden, discord.NotFound): pass
 
+    @play.autocomplete('link')
+    async def play_link_autocomplete(self, interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+        """Suggests previously played tracks by title, artist or album."""
+        return [
+            app_commands.Choice(name=entry.label[:100], value=entry.link)
+            for entry in await self.track_index.search_async(current, limit=25)
+            if len(entry.link) <= 100 # Discord rejects longer choice values
+        ]
+
+
+    def _build_queue_embed(self, guild_id: int, page: int):
+        """Renders one page of a guild's queue. Returns (embed, clamped page, page count)."""
+        queue = self.get_queue(guild_id)
+        now_playing = self.current_track.get(guild_id)
+        page_count = max(1, -(-len(queue) // QUEUE_PAGE_SIZE))
+        page = min(max(page, 0), page_count - 1)
+
+        embed = discord.Embed(title="Song Queue", color=discord.Color.blue())
+        description_lines = []
+
+        # Display Now Playing
+        if now_playing:
+            description_lines.append(f"**Now Playing:**\n`{self._display_name(now_playing)}`\n")
+
+        # Display Next Up (only the requested page is materialized)
+        if queue:
+            description_lines.append("**Next Up:**")
+            start = page * QUEUE_PAGE_SIZE
+            for i, entry in enumerate(queue.page(start, start + QUEUE_PAGE_SIZE), start=start + 1):
+                duration = f" ({format_duration(entry.duration)})" if entry.duration is not None else ""
+                description_lines.append(f"{i}. `{entry.display}`{duration}")
+
+            total = format_duration(queue.total_duration)
+            if queue.unknown_durations:
+                total += f" + {queue.unknown_durations} of unknown length"
+            embed.set_footer(text=f"Page {page + 1}/{page_count} | {len(queue)} queued | Total: {total}")
+        else:
+            embed.set_footer(text="The queue is empty.")
+
+        embed.description = "\n".join(description_lines) or "The queue is empty."
+        return embed, page, page_count
 
     @commands.hybrid_command(name='queue', description='Shows the current song queue.', aliases=['q'])
-    async def queue(self, ctx: commands.Context):
-        """Displays the current song queue."""
+    @app_commands.describe(page='The page of the queue to show')
+    async def queue(self, ctx: commands.Context, page: int = 1):
+        """Displays the current song queue, one page at a time."""
         is_interaction = ctx.interaction is not None
         if is_interaction: await ctx.defer(ephemeral=True)
 
@@ -484,31 +862,128 @@ class VoiceCommands(commands.Cog):
             await ctx.send("The queue is currently empty and nothing is playing.", ephemeral=True)
             return
 
-        embed = discord.Embed(title="Song Queue", color=discord.Color.blue())
-        description_lines = []
+        view = QueuePageView(self, guild_id, page - 1)
+        embed = view.render()
+        if len(queue) <= QUEUE_PAGE_SIZE:
+            await ctx.send(embed=embed, ephemeral=True) # Single page, no buttons needed
+        else:
+            await ctx.send(embed=embed, view=view, ephemeral=True) # Send queue privately
 
-        # Display Now Playing
-        if now_playing:
-            description_lines.append(f"**Now Playing:**\n`{now_playing}`\n")
 
-        # Display Next Up
-        if queue:
-            description_lines.append("**Next Up:**")
-            queue_list = list(queue)
-            for i, link in enumerate(queue_list[:15]): # Limit display length
-                description_lines.append(f"{i+1}. `{link}`")
+    @commands.hybrid_command(name='remove', description='Removes a song from the queue by its position.')
+    @app_commands.describe(position='The queue position of the song to remove')
+    async def remove(self, ctx: commands.Context, position: int):
+        """Removes the song at the given queue position."""
+        is_interaction = ctx.interaction is not None
+        if is_interaction: await ctx.defer(ephemeral=True)
+
+        voice_client = await self._ensure_voice(ctx, connect_if_needed=False)
+        if not voice_client:
+             await ctx.send("I'm not connected to a voice channel.", ephemeral=True)
+             return
+
+        guild_id = ctx.guild.id
+        queue = self.get_queue(guild_id)
+        if not 1 <= position <= len(queue):
+            await ctx.send(f"There's no song at position {position}. The queue has {len(queue)} song(s).", ephemeral=True)
+            return
+        previous_head = queue[0]
+        entry = queue.pop(position - 1)
+        log.info(f"Removed position {position} from queue for guild {guild_id}: {entry.link}")
+        await ctx.send(f"Removed `{entry.display}` from the queue.", ephemeral=True)
+        await self._refresh_predownload(guild_id, previous_head)
+
+
+    @commands.hybrid_command(name='move', description='Moves a song to another position in the queue.')
+    @app_commands.describe(source='The current position of the song', destination='The position to move it to')
+    async def move(self, ctx: commands.Context, source: int, destination: int):
+        """Moves a queued song from one position to another."""
+        is_interaction = ctx.interaction is not None
+        if is_interaction: await ctx.defer(ephemeral=True)
+
+        voice_client = await self._ensure_voice(ctx, connect_if_needed=False)
+        if not voice_client:
+             await ctx.send("I'm not connected to a voice channel.", ephemeral=True)
+             return
+
+        guild_id = ctx.guild.id
+        queue = self.get_queue(guild_id)
+        if not 1 <= source <= len(queue) or not 1 <= destination <= len(queue):
+            await ctx.send(f"Positions must be between 1 and {len(queue)}.", ephemeral=True)
+            return
+        previous_head = queue[0]
+        entry = queue.move(source - 1, destination - 1)
+        await ctx.send(f"Moved `{entry.display}` to position {destination}.", ephemeral=True)
+        await self._refresh_predownload(guild_id, previous_head)
+
+
+    @commands.hybrid_command(name='shuffle', description='Shuffles the queue.')
+    async def shuffle(self, ctx: commands.Context):
+        """Randomizes the order of the queued songs."""
+        is_interaction = ctx.interaction is not None
+        if is_interaction: await ctx.defer(ephemeral=True)
+
+        voice_client = await self._ensure_voice(ctx, connect_if_needed=False)
+        if not voice_client:
+             await ctx.send("I'm not connected to a voice channel.", ephemeral=True)
+             return
+
+        guild_id = ctx.guild.id
+        queue = self.get_queue(guild_id)
+        if len(queue) < 2:
+            await ctx.send("There's nothing to shuffle.", ephemeral=True)
+            return
+        previous_head = queue[0]
+        queue.shuffle()
+        await ctx.send(f"Shuffled {len(queue)} songs.", ephemeral=True)
+        await self._refresh_predownload(guild_id, previous_head)
+
+
+    @commands.hybrid_command(name='dedupe', description='Removes duplicate songs from the queue.')
+    async def dedupe(self, ctx: commands.Context):
+        """Removes repeated songs, keeping each song's first position."""
+        is_interaction = ctx.interaction is not None
+        if is_interaction: await ctx.defer(ephemeral=True)
+
+        voice_client = await self._ensure_voice(ctx, connect_if_needed=False)
+        if not voice_client:
+             await ctx.send("I'm not connected to a voice channel.", ephemeral=True)
+             return
+
+        queue = self.get_queue(ctx.guild.id)
+        removed = queue.dedupe()
+        await ctx.send(f"Removed {removed} duplicate(s)." if removed else "The queue has no duplicates.", ephemeral=True)
 
-            embed.description = "\n".join(description_lines)
-            if len(queue) > 15:
-                embed.set_footer(text=f"... and {len(queue) - 15} more queued.")
-        elif now_playing: # Only playing, no queue
-             embed.description = "\n".join(description_lines)
-             embed.set_footer(text="The queue is empty.")
-        else: # Should be caught by the initial check, but safety
-             embed.description = "The queue is empty."
 
+    @commands.hybrid_command(name='jump', description='Skips ahead to a position in the queue.', aliases=['skipto'])
+    @app_commands.describe(position='The queue position to jump to')
+    async def jump(self, ctx: commands.Context, position: int):
+        """Drops every song before the given position and plays it next."""
+        is_interaction = ctx.interaction is not None
+        if is_interaction: await ctx.defer(ephemeral=True)
+
+        voice_client = await self._ensure_voice(ctx, connect_if_needed=False)
+        if not voice_client:
+             await ctx.send("I'm not connected to a voice channel.", ephemeral=True)
+             return
+
+        guild_id = ctx.guild.id
+        queue = self.get_queue(guild_id)
+        if not 1 <= position <= len(queue):
+            await ctx.send(f"There's no song at position {position}. The queue has {len(queue)} song(s).", ephemeral=True)
+            return
+        queue.jump(position - 1)
+        target = queue[0]
+        log.info(f"Jumped to queue position {position} in guild {guild_id} by request of {ctx.author.name}")
 
-        await ctx.send(embed=embed, ephemeral=True) # Send queue privately
+        await self._cancel_predownload(guild_id)
+        await ctx.send(f"Jumped to `{target.display}`.", ephemeral=True)
+        if voice_client.is_playing() or voice_client.is_paused():
+            voice_client.stop() # Triggers _after_playing, which plays the new head of the queue
+        else:
+            log.info(f"Nothing playing in guild {guild_id}, starting playback from the jump target.")
+            next_link = queue.popleft().link
+            await self._play_song(guild_id, next_link, interaction_channel=ctx.channel, previous_track_path=None)
 
 
     @commands.hybrid_command(name='skip', description='Skips the current song and plays the next.', aliases=['s'])
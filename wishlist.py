@@ -0,0 +1,82 @@
+import logging
+from typing import Dict, Iterable, List, Optional, Set
+
+from json_store import read_json, write_json_atomic
+from text_utils import normalize
+
+log = logging.getLogger(__name__)
+
+
+class WishlistIndex:
+    """Item shop subscriptions stored as an inverted index.
+
+    `_subscribers` maps a normalized item name to the users waiting for it, so
+    matching a shop rotation costs one dict lookup per shop item no matter how many
+    subscriptions exist. `_items` is the reverse mapping used for /wishlist list.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._subscribers: Dict[str, Set[int]] = {} # {normalized item name: {user_id}}
+        self._items: Dict[int, Dict[str, str]] = {} # {user_id: {normalized name: display name}}
+
+    def __len__(self) -> int:
+        """Total number of subscriptions."""
+        return sum(len(users) for users in self._subscribers.values())
+
+    def add(self, user_id: int, item_name: str) -> bool:
+        """Subscribes a user to an item. Returns False if they already were."""
+        key = normalize(item_name)
+        if not key:
+            return False
+        users = self._subscribers.setdefault(key, set())
+        if user_id in users:
+            return False
+        users.add(user_id)
+        self._items.setdefault(user_id, {})[key] = item_name.strip()
+        return True
+
+    def remove(self, user_id: int, item_name: str) -> bool:
+        """Unsubscribes a user from an item. Returns False if they weren't subscribed."""
+        key = normalize(item_name)
+        users = self._subscribers.get(key)
+        if not users or user_id not in users:
+            return False
+        users.discard(user_id)
+        if not users:
+            del self._subscribers[key]
+        user_items = self._items.get(user_id, {})
+        user_items.pop(key, None)
+        if not user_items:
+            self._items.pop(user_id, None)
+        return True
+
+    def items_for(self, user_id: int) -> List[str]:
+        """Display names of everything a user is subscribed to."""
+        return sorted(self._items.get(user_id, {}).values(), key=str.casefold)
+
+    def match(self, item_names: Iterable[str]) -> Dict[int, List[str]]:
+        """Returns {user_id: [matched item names]} for the items in a shop rotation."""
+        matches: Dict[int, List[str]] = {}
+        for name in set(item_names):
+            for user_id in self._subscribers.get(normalize(name), ()):
+                matches.setdefault(user_id, []).append(name)
+        return matches
+
+    # --- Persistence ---
+    def load(self):
+        """Loads subscriptions from the wishlist file, if it exists."""
+        data = read_json(self.path) if self.path else None
+        if data is None:
+            return
+        for user_id, names in data.get("subscriptions", {}).items():
+            for name in names:
+                self.add(int(user_id), name)
+        log.info(f"Loaded {len(self)} wishlist subscriptions.")
+
+    def save(self):
+        if not self.path:
+            return
+        write_json_atomic(self.path, {
+            "subscriptions": {str(user_id): list(items.values()) for user_id, items in list(self._items.items())},
+        })